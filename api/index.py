@@ -1,22 +1,93 @@
+import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, Header, HTTPException
 
-from bot.services import TelegramService, MailService
-from bot.handlers import handle_command, handle_callback, handle_text_message
-from bot.keyboards import get_main_menu
+from bot.services import TelegramService, AsyncMailService, AsyncUserService, UserService
+from bot.services.attachments import close_attachments
+from bot.services.scheduler import BULK
+from bot.services.updates import UpdateDedup, UpdateQueue
+from bot.handlers import handle_update, update_chat_id
+from bot.keyboards import get_main_menu, get_attachment_buttons
 from bot.templates.messages import format_email_full
 
-app = FastAPI()
+# Живут между «тёплыми» вызовами функции, чтобы переиспользовать IMAP-пул и HTTP-соединения
+_tg: TelegramService = None
+_mail: AsyncMailService = None
+_updates: UpdateQueue = None
+_seen_updates = UpdateDedup()
 
 
 def get_services():
-    return TelegramService(), MailService()
+    global _tg, _mail
+    if _tg is None:
+        _tg = TelegramService()
+    if _mail is None:
+        _mail = AsyncMailService()
+    return _tg, _mail
 
 
-async def send_email_with_attachments(tg: TelegramService, chat_id: str, email_data: dict):
+def get_update_queue() -> UpdateQueue | None:
+    """Очередь апдейтов в режиме WEBHOOK_MODE=queue (нужен процесс, живущий после ответа)"""
+    global _updates
+    if _updates is None and os.getenv("WEBHOOK_MODE", "sync") == "queue":
+        _updates = UpdateQueue(handle_webhook)
+    return _updates
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    
+    if _updates:
+        await _updates.close()
+    if _mail:
+        await _mail.close()
+    if _tg:
+        await _tg.close()
+    AsyncUserService.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def send_email_with_attachments(tg: TelegramService, chat_id: str, email_data: dict) -> dict:
     formatted = format_email_full(email_data)
-    await tg.send_email_with_attachments(chat_id, email_data, formatted)
+    return await tg.send_email_with_attachments(
+        chat_id, email_data, formatted, reply_markup=get_attachment_buttons(email_data), priority=BULK
+    )
+
+
+async def deliver_to_chat(tg: TelegramService, chat_id: str, emails: list, semaphore: asyncio.Semaphore) -> dict:
+    """Письма одному чату строго по порядку; чаты обслуживаются параллельно, не больше семафора"""
+    stats = {"sent": 0, "failed": 0}
+    async with semaphore:
+        start = time.perf_counter()
+        for em in emails:
+            try:
+                result = await send_email_with_attachments(tg, chat_id, em)
+            except Exception as e:
+                result = {"ok": False, "description": str(e)}
+            # Telegram отвечает 200 и ok: false на отклонённое сообщение — это тоже не доставлено
+            if result.get("ok"):
+                stats["sent"] += 1
+            else:
+                print(f"Ошибка отправки письма {em.get('uid')} в {chat_id}: {result.get('description')}")
+                stats["failed"] += 1
+        
+        try:
+            await tg.send_message(
+                chat_id,
+                f"📬 Новых писем: {len(emails)}",
+                reply_markup=get_main_menu(),
+                priority=BULK
+            )
+        except Exception as e:
+            print(f"Ошибка отправки сводки в {chat_id}: {e}")
+        stats["seconds"] = round(time.perf_counter() - start, 2)
+    return stats
 
 
 async def handle_cron():
@@ -26,22 +97,26 @@ async def handle_cron():
     if not tg.token or not allowed_chats:
         return {"error": "Not configured"}
     
-    new_emails = mail.get_all_emails(limit=10)
+    new_emails = await mail.get_all_emails(limit=10, preview=True)
     
     if not new_emails:
         return {"status": "no new emails"}
     
-    for chat_id in allowed_chats:
+    semaphore = asyncio.Semaphore(int(os.getenv("CRON_CONCURRENCY", 5)))
+    try:
+        results = await asyncio.gather(*(
+            deliver_to_chat(tg, chat_id, new_emails, semaphore) for chat_id in allowed_chats
+        ))
+    finally:
         for em in new_emails:
-            await send_email_with_attachments(tg, chat_id, em)
-        
-        await tg.send_message(
-            chat_id,
-            f"📬 Новых писем: {len(new_emails)}",
-            reply_markup=get_main_menu()
-        )
+            close_attachments(em)
     
-    return {"status": "ok", "emails_sent": len(new_emails), "users": len(allowed_chats)}
+    return {
+        "status": "ok",
+        "emails_sent": len(new_emails),
+        "users": len(allowed_chats),
+        "chats": dict(zip(allowed_chats, results)),
+    }
 
 
 async def handle_webhook(data: dict):
@@ -51,35 +126,7 @@ async def handle_webhook(data: dict):
     if not tg.token:
         return {"error": "Bot not configured"}
     
-    if "callback_query" in data:
-        callback = data["callback_query"]
-        callback_id = callback["id"]
-        chat_id = str(callback["message"]["chat"]["id"])
-        callback_data = callback["data"]
-        
-        return await handle_callback(
-            callback_data, callback_id, chat_id,
-            tg, mail, email_queues
-        )
-    
-    if "message" in data:
-        message = data["message"]
-        chat_id = str(message["chat"]["id"])
-        text = message.get("text", "")
-        
-        user = message.get("from", {})
-        user_data = {
-            "firstname": user.get("first_name", ""),
-            "name": f"{user.get('first_name', '')} {user.get('last_name', '')}".strip(),
-            "username": user.get("username", ""),
-        }
-        
-        if text.startswith("/"):
-            return await handle_command(text, chat_id, tg, mail, email_queues, user_data)
-        
-        return await handle_text_message(text, chat_id, tg, user_data)
-    
-    return "OK"
+    return await handle_update(data, tg, mail, email_queues)
 
 
 @app.get("/")
@@ -90,8 +137,19 @@ async def root():
 @app.post("/")
 async def webhook(request: Request):
     data = await request.json()
-    result = await handle_webhook(data)
-    return result
+    
+    updates = get_update_queue()
+    chat_id = update_chat_id(data)
+    if chat_id is None or not _seen_updates.add(data["update_id"]):
+        return "OK"
+    if updates and updates.submit(chat_id, data):
+        return "OK"
+    
+    try:
+        return await handle_webhook(data)
+    except Exception:
+        _seen_updates.discard(data["update_id"])
+        raise
 
 
 @app.post("/cron")
@@ -107,4 +165,14 @@ async def cron(authorization: str = Header(None)):
 
 @app.get("/health")
 async def health():
+    if _tg:
+        result = {
+            "status": "ok",
+            "telegram_queue": _tg.scheduler.stats(),
+            "duplicate_updates": _seen_updates.duplicates,
+            "user_cache": UserService.cache().stats(),
+        }
+        if _updates:
+            result["updates"] = _updates.stats()
+        return result
     return {"status": "ok"}
@@ -0,0 +1,85 @@
+"""Задержка загрузки страницы писем: по письму за запрос против одного UID FETCH.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_batch_fetch
+"""
+import time
+from email.message import EmailMessage
+
+from bot.services.mail import MailService, parse_email
+
+PER_PAGE = 10
+RTT_MS = [0, 10, 50, 100]
+
+
+def make_message(i: int) -> bytes:
+    msg = EmailMessage()
+    msg["Subject"] = f"Письмо {i}"
+    msg["From"] = f"Отправитель <sender{i}@example.com>"
+    msg["Date"] = "Mon, 01 Jan 2024 00:00:00 +0000"
+    msg.set_content(f"Текст письма {i}\n" * 20)
+    return msg.as_bytes()
+
+
+class SlowIMAP:
+    """Имитация imaplib-соединения: каждая команда стоит один round trip"""
+
+    def __init__(self, count: int, rtt: float):
+        self.messages = {str(i).encode(): make_message(i) for i in range(1, count + 1)}
+        self.rtt = rtt
+        self.round_trips = 0
+
+    def _round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+
+    def uid(self, command: str, *args):
+        self._round_trip()
+        if command == "SEARCH":
+            return "OK", [b" ".join(self.messages)]
+
+        data = []
+        for uid in args[0].encode().split(b","):
+            raw = self.messages[uid]
+            data.append((b"1 (UID " + uid + b" BODY[] {%d}" % len(raw), raw))
+            data.append(b")")
+        return "OK", data
+
+
+def legacy_page(service: MailService, mail: SlowIMAP, page: int, per_page: int) -> list:
+    """Прежний путь: отдельный FETCH на каждое письмо"""
+    status, messages = mail.uid("SEARCH", None, "ALL")
+    uids = list(reversed(messages[0].split()))[page * per_page:(page + 1) * per_page]
+    emails = []
+    for uid in uids:
+        status, msg_data = mail.uid("FETCH", uid.decode(), "(UID BODY.PEEK[])")
+        emails.append(parse_email(msg_data[0][1], uid))
+    return emails
+
+
+def measure(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    service = MailService()
+    print(f"Страница из {PER_PAGE} писем")
+    print(f"{'RTT, мс':>8} | {'по одному, мс':>14} | {'пакетом, мс':>12} | {'запросов':>9}")
+
+    for rtt_ms in RTT_MS:
+        legacy_conn = SlowIMAP(50, rtt_ms / 1000)
+        batched_conn = SlowIMAP(50, rtt_ms / 1000)
+
+        legacy = measure(legacy_page, service, legacy_conn, 0, PER_PAGE)
+        batched = measure(service._get_emails_page, batched_conn, 0, PER_PAGE)
+
+        print(
+            f"{rtt_ms:>8} | {legacy:>14.1f} | {batched:>12.1f} | "
+            f"{legacy_conn.round_trips:>4} → {batched_conn.round_trips}"
+        )
+
+
+if __name__ == "__main__":
+    main()
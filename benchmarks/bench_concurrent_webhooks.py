@@ -0,0 +1,105 @@
+"""Параллельные webhook-обработчики против медленного IMAP-сервера.
+
+Каждый «webhook» открывает страницу /mail, как handle_callback("mail_0").
+С блокирующим MailService запросы выстраиваются в очередь на event loop,
+с AsyncMailService — выполняются одновременно. Скрипт завершается с
+ошибкой, если асинхронный вариант оказался сериализован.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_concurrent_webhooks
+"""
+import asyncio
+import imaplib
+import sys
+import time
+
+import aioimaplib
+
+from benchmarks.fake_imap import FakeIMAPServer, make_message
+from bot.services import AsyncMailService, MailService
+from bot.services.aio_imap import AsyncIMAPConnectionPool
+from bot.services.imap_pool import IMAPConnectionPool
+
+WEBHOOKS = 8
+DELAY = 0.2
+
+
+class LocalPool(IMAPConnectionPool):
+    port: int = None
+
+    def _connect(self):
+        return imaplib.IMAP4("127.0.0.1", self.port)
+
+
+class AsyncLocalPool(AsyncIMAPConnectionPool):
+    port: int = None
+
+    async def _connect(self):
+        client = aioimaplib.IMAP4("127.0.0.1", self.port, timeout=self.timeout)
+        await client.wait_hello_from_server()
+        return client
+
+
+class LocalMailService(MailService):
+    def _create_pool(self):
+        self.email_addr, self.password = "user", "password"
+        return LocalPool(self.server, self.email_addr, self.password, size=WEBHOOKS)
+
+    def _cache_key(self, uid: bytes) -> None:
+        # Замеряем сетевой путь, локальный кэш писем не используется
+        return None
+
+
+class AsyncLocalMailService(AsyncMailService):
+    def _create_pool(self):
+        self.email_addr, self.password = "user", "password"
+        return AsyncLocalPool(self.server, self.email_addr, self.password, size=WEBHOOKS)
+
+    def _cache_key(self, uid: bytes) -> None:
+        return None
+
+
+async def blocking_webhook(mail: MailService):
+    emails, _, _ = mail.get_email_summaries_page(page=0, per_page=10)
+    return emails
+
+
+async def async_webhook(mail: AsyncMailService):
+    emails, _, _ = await mail.get_email_summaries_page(page=0, per_page=10)
+    return emails
+
+
+async def run(webhook, mail) -> float:
+    # Прогрев: соединения пула открываются заранее
+    await asyncio.gather(*(webhook(mail) for _ in range(WEBHOOKS)))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(webhook(mail) for _ in range(WEBHOOKS)))
+    elapsed = time.perf_counter() - start
+
+    assert all(len(emails) == 10 for emails in results)
+    return elapsed
+
+
+async def main() -> int:
+    server = FakeIMAPServer([make_message(i) for i in range(1, 31)], delay=DELAY).start()
+    LocalPool.port = AsyncLocalPool.port = server.port
+
+    blocking = await run(blocking_webhook, LocalMailService())
+    concurrent = await run(async_webhook, AsyncLocalMailService())
+
+    # Открытие страницы — два запроса к серверу (SEARCH + FETCH)
+    single = 2 * DELAY
+    print(f"{WEBHOOKS} webhook-ов, задержка IMAP {DELAY * 1000:.0f} мс на команду")
+    print(f"  MailService (блокирующий): {blocking:.2f} с")
+    print(f"  AsyncMailService:          {concurrent:.2f} с (один запрос ≈ {single:.2f} с)")
+
+    if concurrent > 2 * single:
+        print("❌ Асинхронные запросы выполнились последовательно")
+        return 1
+    print("✅ Запросы не сериализуются")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,102 @@
+"""Сборка inline-клавиатур: модели aiogram против dict-сборщика и замороженных клавиатур.
+
+Для каждой клавиатуры бота сравнивается InlineButtonInterface.create_markup_dict
+(InlineKeyboardButton/InlineKeyboardMarkup + model_dump), build_markup_dict
+(dict без pydantic) и то, что сейчас возвращает функция из bot.keyboards.
+Результаты всех способов должны совпадать.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_keyboards
+"""
+import json
+import sys
+import timeit
+
+from bot.components import InlineButtonInterface
+from bot.keyboards import inline
+
+ROUNDS = 5
+
+
+def email_data(attachments: int) -> dict:
+    return {
+        "uid": "1234",
+        "attachments": [
+            {"filename": f"Отчёт за квартал {i}.pdf", "section": str(i + 2)} for i in range(attachments)
+        ],
+    }
+
+
+def email_list() -> list:
+    return [{"uid": str(1000 + i)} for i in range(10)]
+
+
+# (название, исходные кнопки для create_markup_dict, текущая функция)
+KEYBOARDS = [
+    (
+        "главное меню",
+        lambda: [
+            [{"text": "🔄 Проверить новые", "callback_data": "check_mail"}],
+            [{"text": "📬 Открыть почту", "callback_data": "mail_0"}],
+        ],
+        lambda: inline.get_main_menu(),
+    ),
+    (
+        "список писем",
+        None,
+        lambda: inline.get_email_list_buttons(email_list(), 2, 5),
+    ),
+    (
+        "письмо",
+        lambda: inline._view_rows(2),
+        lambda: inline.get_email_view_buttons(2),
+    ),
+    (
+        "письмо + 3 влож.",
+        lambda: inline._attachment_rows(email_data(3)) + inline._view_rows(2),
+        lambda: inline.get_email_view_buttons(2, email_data(3)),
+    ),
+    (
+        "следующее",
+        lambda: inline._next_rows(4),
+        lambda: inline.get_next_button(4),
+    ),
+]
+
+
+def list_rows() -> list:
+    # Те же кнопки, что строит get_email_list_buttons
+    markup = inline.get_email_list_buttons(email_list(), 2, 5)
+    return [[dict(button) for button in row] for row in markup["inline_keyboard"]]
+
+
+def per_call_us(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=ROUNDS)) / number * 1e6
+
+
+def main() -> int:
+    print(f"{'клавиатура':>18} | {'aiogram, мкс':>12} | {'dict, мкс':>9} | {'сейчас, мкс':>11} | {'ускорение':>9}")
+    ok = True
+    for name, rows, current in KEYBOARDS:
+        data = rows() if rows else list_rows()
+        rows = rows or (lambda: data)
+
+        expected = InlineButtonInterface.create_markup_dict(data)
+        for result in (InlineButtonInterface.build_markup_dict(data), current()):
+            if json.dumps(result, ensure_ascii=False) != json.dumps(expected, ensure_ascii=False):
+                print(f"❌ {name}: клавиатура отличается от aiogram")
+                ok = False
+
+        pydantic_us = per_call_us(lambda: InlineButtonInterface.create_markup_dict(rows()), 2000)
+        dict_us = per_call_us(lambda: InlineButtonInterface.build_markup_dict(rows()), 2000)
+        current_us = per_call_us(current, 2000)
+        print(f"{name:>18} | {pydantic_us:>12.1f} | {dict_us:>9.1f} | {current_us:>11.1f} | {pydantic_us / current_us:>8.1f}x")
+
+    if not ok:
+        return 1
+    print("✅ Клавиатуры совпадают с aiogram")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Скорость разбора писем (MIME + html2text) в зависимости от числа воркеров.
+
+Корпус синтетический: простые письма, HTML-рассылки и письма с вложением.
+Для каждого режима пула (thread, process) и числа воркеров от 1 до N
+выводится число разобранных писем в секунду.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_parse_workers [N]
+"""
+import os
+import sys
+import time
+from email.message import EmailMessage
+
+from bot.services.attachments import close_attachments
+from bot.services.mail import parse_email
+from bot.services.parsing import ParserPool
+
+CORPUS_SIZE = 120
+ROUNDS = 3
+
+
+def make_corpus(size: int) -> list[bytes]:
+    corpus = []
+    for i in range(size):
+        msg = EmailMessage()
+        msg["Subject"] = f"Письмо {i}"
+        msg["From"] = f"Отправитель <sender{i}@example.com>"
+        msg["Date"] = "Mon, 01 Jan 2024 00:00:00 +0000"
+
+        kind = i % 3
+        if kind == 0:
+            msg.set_content(f"Текст письма {i}\n" * 200)
+        elif kind == 1:
+            rows = "".join(
+                f"<tr><td><a href='https://example.com/{j}'>Товар {j}</a></td><td><b>{j * 10} ₽</b></td></tr>"
+                for j in range(400)
+            )
+            msg.set_content(f"Рассылка {i}")
+            msg.add_alternative(f"<html><body><h1>Рассылка {i}</h1><table>{rows}</table></body></html>", subtype="html")
+        else:
+            msg.set_content(f"Отчёт {i} во вложении")
+            msg.add_attachment(os.urandom(256 * 1024), maintype="application", subtype="pdf", filename=f"report{i}.pdf")
+        corpus.append(msg.as_bytes())
+    return corpus
+
+
+def measure(pool: ParserPool, corpus: list[bytes]) -> float:
+    uids = [str(i).encode() for i in range(len(corpus))]
+    # Прогрев: воркеры и их HTML2Text создаются до замера
+    for em in pool.map(parse_email, corpus[:pool.workers], uids[:pool.workers]):
+        close_attachments(em)
+
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        emails = pool.map(parse_email, corpus, uids)
+        best = min(best, time.perf_counter() - start)
+        for em in emails:
+            close_attachments(em)
+    return len(corpus) / best
+
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    corpus = make_corpus(CORPUS_SIZE)
+    print(f"Корпус: {len(corpus)} писем, {sum(map(len, corpus)) / 1024 / 1024:.1f} МБ, ядер: {os.cpu_count()}")
+    print(f"{'воркеров':>8} | {'thread, писем/с':>16} | {'process, писем/с':>17}")
+
+    for workers in range(1, max_workers + 1):
+        rates = []
+        for kind in ("thread", "process"):
+            pool = ParserPool(workers, kind)
+            try:
+                rates.append(measure(pool, corpus))
+            finally:
+                pool.close()
+        print(f"{workers:>8} | {rates[0]:>16.1f} | {rates[1]:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
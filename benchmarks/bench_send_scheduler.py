@@ -0,0 +1,106 @@
+"""Рассылка уведомлений в несколько чатов против лимитов Telegram.
+
+Фейковый Bot API отвечает 429, если превышен лимит чата (1/с, запас 3)
+или глобальный (30/с). Сравнивается отправка без ограничений и через
+SendScheduler; посреди рассылки пользователь нажимает кнопку — замеряется,
+сколько ждёт интерактивный ответ.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_send_scheduler
+"""
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+
+from bot.services import TelegramService
+from bot.services.scheduler import BULK, SendScheduler, TokenBucket
+
+CHATS = 5
+EMAILS = 6
+
+
+class FakeBotAPI:
+    def __init__(self):
+        self.global_bucket = TokenBucket(30, 30)
+        self.chats: dict[str, TokenBucket] = {}
+        self.delivered = 0
+        self.rejected = 0
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        now = time.monotonic()
+        payload = json.loads(request.content) if request.content else {}
+        chat_id = str(payload.get("chat_id", ""))
+
+        buckets = [self.global_bucket]
+        if chat_id:
+            buckets.append(self.chats.setdefault(chat_id, TokenBucket(1, 3)))
+        if any(bucket.delay(now) > 0 for bucket in buckets):
+            self.rejected += 1
+            return httpx.Response(429, json={"ok": False, "parameters": {"retry_after": 1}})
+
+        for bucket in buckets:
+            bucket.take()
+        self.delivered += 1
+        return httpx.Response(200, json={"ok": True})
+
+
+async def run(scheduler: SendScheduler) -> dict:
+    api = FakeBotAPI()
+    tg = TelegramService("token")
+    tg.scheduler = scheduler
+    tg._client = httpx.AsyncClient(transport=httpx.MockTransport(api.handle))
+    tg._client_loop = asyncio.get_running_loop()
+
+    async def notify(chat_id: str):
+        for i in range(EMAILS):
+            await tg.send_message(chat_id, f"Письмо {i}", priority=BULK)
+
+    async def click() -> float:
+        await asyncio.sleep(0.5)
+        start = time.perf_counter()
+        await tg.answer_callback("callback")
+        await tg.send_message("1", "Страница писем")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(click(), *(notify(str(chat)) for chat in range(1, CHATS + 1)))
+    elapsed = time.perf_counter() - start
+    stats = scheduler.stats()
+    await tg.close()
+
+    return {
+        "elapsed": elapsed,
+        "interactive": results[0],
+        "delivered": api.delivered,
+        "rejected": api.rejected,
+        "stats": stats,
+    }
+
+
+async def main() -> int:
+    # Лимиты заведомо выше реальных — планировщик ничего не сдерживает
+    unlimited = await run(SendScheduler(global_rate=1e9, chat_rate=1e9, chat_burst=1e9, group_rate=1e9))
+    scheduled = await run(SendScheduler())
+
+    print(f"{CHATS} чатов × {EMAILS} уведомлений, клик пользователя через 0.5 с")
+    print(f"{'':>14} | {'время, с':>8} | {'429':>4} | {'ответ на клик, с':>16}")
+    for name, result in (("без лимитов", unlimited), ("SendScheduler", scheduled)):
+        print(f"{name:>14} | {result['elapsed']:>8.2f} | {result['rejected']:>4} | {result['interactive']:>16.2f}")
+    print(f"Метрики очереди: {scheduled['stats']}")
+
+    expected = CHATS * EMAILS + 2
+    if scheduled["delivered"] != expected or scheduled["rejected"]:
+        print("❌ Планировщик не уложился в лимиты")
+        return 1
+    if scheduled["interactive"] > 1.5:
+        print("❌ Интерактивный ответ ждал за массовой рассылкой")
+        return 1
+    print("✅ Все сообщения доставлены без 429, клик обслужен вне очереди")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,140 @@
+"""Одновременные webhook и запросы к хранилищу пользователей.
+
+Хранилище подменено синхронным, каждый запрос блокирует поток на DELAY
+(как сетевой запрос к Supabase). N чатов одновременно нажимают кнопку;
+сравнивается прежний вызов UserService прямо в обработчике, который
+блокирует event loop, и AsyncUserService, который уводит запрос в пул
+потоков. Во втором случае все апдейты должны закончиться примерно за
+время одного запроса к хранилищу, а не за N.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_user_store
+"""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+CHATS = 8
+DELAY = 0.2
+
+os.environ["TELEGRAM_CHAT_ID"] = ",".join(str(chat) for chat in range(1, CHATS + 1))
+os.environ.setdefault("USER_STORE_WORKERS", str(CHATS))
+
+from bot.handlers import callbacks, handle_update  # noqa: E402
+from bot.services import AsyncUserService, TelegramService, UserService  # noqa: E402
+from bot.services.user import UserCache  # noqa: E402
+from database.database import UserStore  # noqa: E402
+
+
+class SlowStore(UserStore):
+    """Пользователи зарегистрированы; каждый запрос блокирует поток на DELAY"""
+    calls = 0
+
+    @classmethod
+    def get_user(cls, user_id: int):
+        cls.calls += 1
+        time.sleep(DELAY)
+        return {"user_id": int(user_id), "is_registered": True}
+
+    @classmethod
+    def create_user(cls, user_data: dict) -> dict:
+        return user_data
+
+    @classmethod
+    def update_user(cls, user_id: int, data: dict) -> dict:
+        return data
+
+    @classmethod
+    def upsert_user(cls, user_data: dict, overwrite: bool = True) -> dict:
+        return user_data
+
+    @classmethod
+    def get_registered_users(cls) -> list[dict]:
+        return []
+
+    @classmethod
+    def delete_user(cls, user_id: int) -> bool:
+        return False
+
+
+class BlockingUserService(UserService):
+    """Как обработчики вызывали UserService раньше — синхронно, внутри event loop"""
+
+    @classmethod
+    async def is_registered(cls, user_id: int) -> bool:
+        return UserService.is_registered(user_id)
+
+
+def make_update(chat_id: int) -> dict:
+    return {
+        "update_id": chat_id,
+        "callback_query": {
+            "id": f"cb{chat_id}",
+            "data": "noop",
+            "message": {"message_id": 1, "chat": {"id": chat_id}},
+        },
+    }
+
+
+async def run(user_service: type) -> dict:
+    UserService._store = SlowStore
+    UserService._cache = UserCache()
+    SlowStore.calls = 0
+    callbacks.AsyncUserService = user_service
+
+    tg = TelegramService("bench")
+    tg._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"ok": True, "result": True}))
+    )
+    tg._client_loop = asyncio.get_running_loop()
+
+    # Тик event loop: при блокировке он запаздывает на время запроса к хранилищу
+    lag = 0.0
+    stop = asyncio.Event()
+
+    async def ticker():
+        nonlocal lag
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lag = max(lag, time.perf_counter() - start - 0.01)
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.sleep(0.02)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handle_update(make_update(chat), tg, None, {}) for chat in range(1, CHATS + 1)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticking
+    await tg.close()
+    return {"elapsed": elapsed, "lag": lag, "calls": SlowStore.calls}
+
+
+async def main() -> int:
+    blocking = await run(BlockingUserService)
+    pooled = await run(AsyncUserService)
+    callbacks.AsyncUserService = AsyncUserService
+    AsyncUserService.close()
+
+    print(f"{CHATS} одновременных webhook, запрос к хранилищу {DELAY * 1000:.0f} мс")
+    print(f"{'':>10} | {'всё, с':>6} | {'задержка loop, мс':>17} | {'запросов':>8}")
+    for name, result in (("sync", blocking), ("async", pooled)):
+        print(f"{name:>10} | {result['elapsed']:>6.2f} | {result['lag'] * 1000:>17.0f} | {result['calls']:>8}")
+
+    if pooled["calls"] != CHATS:
+        print("❌ Запросов к хранилищу не столько, сколько чатов")
+        return 1
+    if pooled["elapsed"] > DELAY * 2:
+        print("❌ Запросы к хранилищу выполняются по очереди")
+        return 1
+    print(f"✅ Webhook не ждут друг друга: {pooled['elapsed']:.2f} с вместо {blocking['elapsed']:.2f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,96 @@
+"""Время ответа webhook: синхронная обработка против WEBHOOK_MODE=queue.
+
+Обработчик апдейта подменён задержкой (как IMAP-запрос и отправка
+вложений). Несколько чатов присылают по серии апдейтов одновременно;
+замеряется, сколько ждёт ответа Telegram, и проверяется, что апдейты
+одного чата обработаны по порядку, а повторы не обработаны второй раз.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_webhook_ack
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+import main as server
+from bot.services.updates import UpdateDedup, UpdateQueue
+
+CHATS = 4
+UPDATES = 3
+DELAY = 0.3
+
+
+def make_update(update_id: int, chat_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {"chat": {"id": chat_id}, "from": {"first_name": "Тест"}, "text": f"/check {update_id}"},
+    }
+
+
+async def run(queue: bool) -> dict:
+    processed: dict[str, list] = {}
+
+    async def slow_handle_update(update, tg, mail, email_queues):
+        await asyncio.sleep(DELAY)
+        chat_id = str(update["message"]["chat"]["id"])
+        processed.setdefault(chat_id, []).append(update["update_id"])
+        return "OK"
+
+    server.handle_update = slow_handle_update
+    server.seen_updates = UpdateDedup()
+    server.updates = UpdateQueue(lambda update: slow_handle_update(update, None, None, {})) if queue else None
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bot")
+    acks = []
+
+    async def post(update: dict):
+        start = time.perf_counter()
+        resp = await client.post("/webhook", json=update)
+        acks.append(time.perf_counter() - start)
+        assert resp.status_code == 200
+
+    async def chat_series(chat_id: int):
+        # Telegram шлёт апдейты одного чата по очереди; каждый ещё раз повторяет (как после таймаута)
+        for i in range(UPDATES):
+            await post(make_update(chat_id * 100 + i, chat_id))
+            await post(make_update(chat_id * 100 + i, chat_id))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(chat_series(chat) for chat in range(1, CHATS + 1)))
+    if server.updates:
+        await server.updates.close()
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+
+    ordered = all(ids == sorted(ids) and len(ids) == UPDATES for ids in processed.values())
+    return {
+        "ack_max": max(acks),
+        "ack_avg": sum(acks) / len(acks),
+        "elapsed": elapsed,
+        "ordered": ordered and len(processed) == CHATS,
+    }
+
+
+async def main() -> int:
+    sync = await run(queue=False)
+    queued = await run(queue=True)
+
+    print(f"{CHATS} чатов × {UPDATES} апдейтов, обработка {DELAY * 1000:.0f} мс")
+    print(f"{'':>8} | {'ответ avg, мс':>13} | {'ответ max, мс':>13} | {'всё, с':>6}")
+    for name, result in (("sync", sync), ("queue", queued)):
+        print(f"{name:>8} | {result['ack_avg'] * 1000:>13.1f} | {result['ack_max'] * 1000:>13.1f} | {result['elapsed']:>6.2f}")
+
+    if not queued["ordered"]:
+        print("❌ Апдейты чата обработаны не по порядку или повторно")
+        return 1
+    if queued["ack_max"] > 0.05:
+        print("❌ Webhook в режиме очереди отвечает медленно")
+        return 1
+    print(f"✅ Webhook отвечает сразу, порядок внутри чата сохранён, повторов отброшено: {server.seen_updates.duplicates}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,98 @@
+"""Бюджет холодного импорта точек входа (python -X importtime).
+
+Каждая точка входа импортируется в отдельном процессе несколько раз,
+берётся лучший результат. Скрипт завершается с ошибкой, если импорт
+дольше бюджета или при импорте подгрузилась тяжёлая зависимость,
+которая должна загружаться только при первом использовании.
+
+Запуск из корня репозитория:
+    python -m benchmarks.check_import_time [--budget api.index=800]
+"""
+import os
+import re
+import subprocess
+import sys
+
+# Бюджеты в миллисекундах: около 1.2 от замеренных 650–790 мс, чтобы ловить возврат тяжёлого импорта
+ENTRY_POINTS = {
+    "api.index": 950,
+    "main": 950,
+}
+# Загружаются лениво: aiogram (с aiohttp) — только для моделей клавиатур, supabase и его клиенты —
+# при первом запросе к базе, sqlmodel и sqlalchemy — при выборе USER_STORE=sqlite,
+# html2text — при первом HTML-письме
+LAZY_MODULES = (
+    "aiogram",
+    "aiohttp",
+    "supabase",
+    "postgrest",
+    "realtime",
+    "storage3",
+    "supabase_auth",
+    "sqlmodel",
+    "sqlalchemy",
+    "html2text",
+)
+RUNS = 3
+
+LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def import_profile(module: str) -> dict[str, int]:
+    """{модуль: суммарное время импорта в мкс} для одного холодного импорта"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Не удалось импортировать {module}:\n{result.stderr[-2000:]}")
+
+    profile = {}
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            profile[match.group(4)] = int(match.group(2))
+    return profile
+
+
+def parse_budgets(args: list) -> dict:
+    budgets = dict(ENTRY_POINTS)
+    for i, arg in enumerate(args):
+        if arg == "--budget" and i + 1 < len(args):
+            module, ms = args[i + 1].split("=")
+            budgets[module] = int(ms)
+    return budgets
+
+
+def main() -> int:
+    budgets = parse_budgets(sys.argv[1:])
+    failed = False
+
+    print(f"{'точка входа':>12} | {'импорт, мс':>10} | {'бюджет, мс':>10}")
+    for module, budget in budgets.items():
+        profiles = [import_profile(module) for _ in range(RUNS)]
+        best_ms = min(profile[module] for profile in profiles) / 1000
+        print(f"{module:>12} | {best_ms:>10.0f} | {budget:>10}")
+
+        if best_ms > budget:
+            print(f"❌ {module}: импорт дольше бюджета")
+            failed = True
+
+        eager = sorted({name for name in profiles[0] if name.split(".")[0] in LAZY_MODULES})
+        if eager:
+            heaviest = sorted(eager, key=lambda name: -profiles[0][name])[:3]
+            print(f"❌ {module}: импортируются сразу {', '.join(heaviest)}")
+            failed = True
+
+    if failed:
+        return 1
+    print("✅ Холодный импорт в пределах бюджета")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
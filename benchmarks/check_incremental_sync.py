@@ -0,0 +1,72 @@
+"""Проверка IncrementalSync: каждое письмо доставляется ровно один раз.
+
+Главный случай — гонка STATUS/SEARCH: письмо приходит после STATUS, но
+до SEARCH UID n+1:*. Поиск его уже находит, а UIDNEXT из STATUS ещё нет,
+поэтому сохранённый last_uid должен учитывать UID из выборки. Иначе
+следующий опрос найдёт это письмо снова.
+
+Запуск из корня репозитория:
+    python -m benchmarks.check_incremental_sync
+"""
+import os
+import sys
+import tempfile
+
+from bot.services.sync import IncrementalSync, MailboxSyncState
+
+UIDVALIDITY = 7
+
+
+def make_sync(path: str, last_uid: int = None) -> IncrementalSync:
+    sync = IncrementalSync("bench@example.com/INBOX", MailboxSyncState(path))
+    if last_uid is not None:
+        sync.commit({"UIDVALIDITY": UIDVALIDITY}, last_uid)
+    return sync
+
+
+def poll(sync: IncrementalSync, uidnext: int, found: list, limit: int = 5) -> list:
+    """Один опрос: STATUS видит uidnext, SEARCH уже находит found"""
+    status = {"UIDVALIDITY": UIDVALIDITY, "UIDNEXT": uidnext}
+    criteria = sync.search_criteria(status)
+    uids = [str(uid).encode() for uid in found] if criteria else []
+    new_uids, last_uid = sync.select_new(status, uids, limit)
+    sync.commit(status, last_uid)
+    return [int(uid) for uid in new_uids]
+
+
+def check(name: str, delivered: list, expected: list) -> bool:
+    ok = delivered == expected
+    print(f"{'✅' if ok else '❌'} {name}: доставлено {delivered}, ожидалось {expected}")
+    return ok
+
+
+def main() -> int:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Гонка: сохранено 99, STATUS видит UIDNEXT=101, а SEARCH уже находит и 101
+        sync = make_sync(os.path.join(tmp, "race.json"), last_uid=99)
+        first = poll(sync, uidnext=101, found=[100, 101])
+        results.append(check("STATUS/SEARCH, опрос 1", first, [100, 101]))
+        results.append(check("STATUS/SEARCH, сохранён last_uid", [sync.state.get(sync.key)["last_uid"]], [101]))
+        second = poll(sync, uidnext=102, found=[101])
+        results.append(check("STATUS/SEARCH, опрос 2", second, []))
+
+        # То же при первом запуске (поиск UNSEEN)
+        sync = make_sync(os.path.join(tmp, "first.json"))
+        first = poll(sync, uidnext=11, found=[9, 10, 11])
+        second = poll(sync, uidnext=12, found=[11])
+        results.append(check("первый запуск, опрос 1", first, [9, 10, 11]))
+        results.append(check("первый запуск, опрос 2", second, []))
+
+        # Больше limit новых писем: остаток — следующему опросу, без пропусков
+        sync = make_sync(os.path.join(tmp, "limit.json"), last_uid=10)
+        first = poll(sync, uidnext=18, found=list(range(11, 18)), limit=5)
+        second = poll(sync, uidnext=18, found=[16, 17], limit=5)
+        results.append(check("больше limit, опрос 1", first, [11, 12, 13, 14, 15]))
+        results.append(check("больше limit, опрос 2", second, [16, 17]))
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
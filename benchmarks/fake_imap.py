@@ -0,0 +1,74 @@
+"""Минимальный IMAP-сервер для замеров: отвечает из памяти с задержкой на команду."""
+import asyncio
+import re
+import threading
+from email.message import EmailMessage
+
+
+def make_message(i: int, attachment_size: int = 0) -> bytes:
+    msg = EmailMessage()
+    msg["Subject"] = f"Письмо {i}"
+    msg["From"] = f"Отправитель <sender{i}@example.com>"
+    msg["Date"] = "Mon, 01 Jan 2024 00:00:00 +0000"
+    msg.set_content(f"Текст письма {i}\n" * 20)
+    if attachment_size:
+        msg.add_attachment(b"x" * attachment_size, maintype="application", subtype="pdf", filename=f"file{i}.pdf")
+    return msg.as_bytes()
+
+
+class FakeIMAPServer:
+    """Сервер в отдельном потоке со своим event loop, чтобы его не блокировал клиент"""
+
+    def __init__(self, messages: list[bytes], delay: float = 0.0):
+        self.messages = messages
+        self.delay = delay
+        self.port = None
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+
+    def start(self) -> "FakeIMAPServer":
+        threading.Thread(target=self._run, daemon=True).start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0))
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(b"* OK fake IMAP ready\r\n")
+        while line := await reader.readline():
+            tag, _, command = line.decode().strip().partition(" ")
+            name = command.split(" ", 1)[0].upper()
+            if self.delay and name not in ("CAPABILITY", "LOGIN", "SELECT", "LOGOUT"):
+                await asyncio.sleep(self.delay)
+
+            if name == "CAPABILITY":
+                writer.write(b"* CAPABILITY IMAP4rev1 IDLE\r\n")
+            elif name == "SELECT":
+                writer.write(f"* {len(self.messages)} EXISTS\r\n* OK [UIDVALIDITY 1] ok\r\n".encode())
+            elif name == "UID" and "SEARCH" in command.upper():
+                uids = " ".join(str(i) for i in range(1, len(self.messages) + 1))
+                writer.write(f"* SEARCH {uids}\r\n".encode())
+            elif name == "UID" and "FETCH" in command.upper():
+                self._fetch(writer, command.split(" ")[2])
+            elif name == "LOGOUT":
+                writer.write(b"* BYE\r\n")
+            writer.write(f"{tag} OK done\r\n".encode())
+            await writer.drain()
+        writer.close()
+
+    def _fetch(self, writer: asyncio.StreamWriter, uid_set: str):
+        for uid in (int(u) for u in uid_set.split(",")):
+            raw = self.messages[uid - 1]
+            subject = re.search(rb"Subject: (.*)\r?\n", raw).group(1).decode()
+            envelope = f'("Mon, 01 Jan 2024 00:00:00 +0000" "{subject}" (("Sender" NIL "sender" "example.com")) NIL NIL NIL NIL NIL NIL NIL)'
+            structure = '("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "8BIT" 100 5 NIL NIL NIL NIL)'
+            writer.write(
+                f"* {uid} FETCH (UID {uid} RFC822.SIZE {len(raw)} ENVELOPE {envelope} "
+                f"BODYSTRUCTURE {structure} BODY[] {{{len(raw)}}}\r\n".encode()
+            )
+            writer.write(raw + b")\r\n")
@@ -1,6 +1,7 @@
 from .button import (
     ButtonFactory,
     ButtonFactoryExtended,
+    FrozenMarkup,
     InlineButtonInterface,
     ReplyButtonInterface,
 )
@@ -8,6 +9,7 @@ from .button import (
 __all__ = [
     "ButtonFactory",
     "ButtonFactoryExtended", 
+    "FrozenMarkup",
     "InlineButtonInterface",
     "ReplyButtonInterface",
 ]
@@ -1,12 +1,49 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
-from aiogram.types import (
-    InlineKeyboardButton,
-    InlineKeyboardMarkup,
-    KeyboardButton,          # <- correct type for reply keyboards
-    ReplyKeyboardMarkup,
-    WebAppInfo,
-)
+from typing import TYPE_CHECKING, List, Dict, Any
+
+# aiogram.types импортируется секунды — только там, где нужны модели, а не dict
+if TYPE_CHECKING:
+    from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup
+
+
+# Ограничение Bot API на callback_data
+MAX_CALLBACK_DATA_BYTES = 64
+
+
+class FrozenMarkup(dict):
+    """Неизменяемая клавиатура: один и тот же объект можно отдавать на каждый вызов"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Клавиатура заморожена")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __hash__(self):
+        return id(self)
+
+    def __reduce__(self):
+        return FrozenMarkup, (dict(self),)
+
+
+def inline_button_dict(button_dict: Dict[str, Any]) -> dict:
+    """Кнопка в виде dict для Bot API — как InlineKeyboardButton.model_dump, но без pydantic"""
+    text = button_dict.get("text")
+    if not isinstance(text, str) or not text:
+        raise ValueError(f"У кнопки нет текста: {button_dict}")
+
+    web_app = button_dict.get("web_app")
+    url = button_dict.get("url")
+    if web_app:
+        return {"text": text, "web_app": {"url": web_app} if isinstance(web_app, str) else dict(web_app)}
+    if url:
+        if not isinstance(url, str):
+            raise ValueError(f"url кнопки должен быть строкой: {button_dict}")
+        return {"text": text, "url": url}
+
+    callback_data = button_dict.get("callback_data") or button_dict.get("callback") or text
+    if not isinstance(callback_data, str) or len(callback_data.encode()) > MAX_CALLBACK_DATA_BYTES:
+        raise ValueError(f"callback_data должен быть строкой до {MAX_CALLBACK_DATA_BYTES} байт: {button_dict}")
+    return {"text": text, "callback_data": callback_data}
 
 
 class ButtonComponent(ABC):
@@ -18,7 +55,8 @@ class ButtonComponent(ABC):
 
 class InlineButtonComponent(ButtonComponent):
 
-    def create_markup(self, buttons_data: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
+    def create_markup(self, buttons_data: List[Dict[str, Any]]) -> "InlineKeyboardMarkup":
+        from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
 
         buttons = []
         for button_info in buttons_data:
@@ -51,7 +89,8 @@ class InlineButtonComponent(ButtonComponent):
 
 class ReplyButtonComponent(ButtonComponent):
 
-    def create_markup(self, buttons_data: List[Dict[str, Any]]) -> ReplyKeyboardMarkup:
+    def create_markup(self, buttons_data: List[Dict[str, Any]]) -> "ReplyKeyboardMarkup":
+        from aiogram.types import KeyboardButton, ReplyKeyboardMarkup, WebAppInfo
 
         keyboard = []
         for button_info in buttons_data:
@@ -121,7 +160,7 @@ class ReplyButtonInterface:
     _component = ButtonFactory.create_button_component("reply")
     
     @classmethod
-    def create_markup(cls, buttons_data: List[Dict[str, Any]]) -> ReplyKeyboardMarkup:
+    def create_markup(cls, buttons_data: List[Dict[str, Any]]) -> "ReplyKeyboardMarkup":
         return cls._component.create_markup(buttons_data)
     
     @classmethod
@@ -134,7 +173,7 @@ class InlineButtonInterface:
     _component = ButtonFactory.create_button_component("inline")
     
     @classmethod
-    def create_markup(cls, buttons_data: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
+    def create_markup(cls, buttons_data: List[Dict[str, Any]]) -> "InlineKeyboardMarkup":
         return cls._component.create_markup(buttons_data)
     
     @classmethod
@@ -142,6 +181,20 @@ class InlineButtonInterface:
         markup = cls._component.create_markup(buttons_data)
         return markup.model_dump(exclude_none=True)
 
+    @staticmethod
+    def build_markup_dict(buttons_data: List[Dict[str, Any]]) -> dict:
+        """То же, что create_markup_dict, без промежуточных моделей aiogram"""
+        return {"inline_keyboard": [[inline_button_dict(button) for button in row] for row in buttons_data]}
+
+    @staticmethod
+    def frozen_markup_dict(buttons_data: List[Dict[str, Any]]) -> FrozenMarkup:
+        """Клавиатура, которая не меняется: собирается один раз и больше не копируется"""
+        rows = tuple(
+            tuple(FrozenMarkup(inline_button_dict(button)) for button in row)
+            for row in buttons_data
+        )
+        return FrozenMarkup(inline_keyboard=rows)
+
 
 
         
@@ -1,4 +1,12 @@
 from .commands import handle_command, handle_text_message, awaiting_password
 from .callbacks import handle_callback
+from .dispatch import handle_update, update_chat_id
 
-__all__ = ["handle_command", "handle_callback", "handle_text_message", "awaiting_password"]
+__all__ = [
+    "handle_command",
+    "handle_callback",
+    "handle_text_message",
+    "awaiting_password",
+    "handle_update",
+    "update_chat_id",
+]
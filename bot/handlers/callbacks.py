@@ -1,9 +1,9 @@
-from bot.services import TelegramService, MailService, UserService
-from bot.keyboards import get_main_menu, get_email_list_buttons, get_email_view_buttons
+from bot.services import TelegramService, AsyncMailService, AsyncUserService
+from bot.services.attachments import close_attachments
+from bot.keyboards import get_main_menu, get_email_view_buttons, get_attachment_buttons
 from bot.keyboards.inline import get_next_button
 from bot.templates.messages import (
     format_email_full,
-    format_email_list,
     NO_EMAILS_MESSAGE,
     NO_EMAILS_FOUND,
     EMAILS_FOUND,
@@ -11,6 +11,7 @@ from bot.templates.messages import (
     AUTH_REQUIRED,
 )
 from .commands import awaiting_password
+from .pages import render_email_page
 
 user_pages: dict[str, int] = {}
 
@@ -20,8 +21,9 @@ async def handle_callback(
     callback_id: str,
     chat_id: str,
     tg: TelegramService,
-    mail: MailService,
-    email_queues: dict
+    mail: AsyncMailService,
+    email_queues: dict,
+    message_id: int = None
 ) -> str:
     
     if not tg.is_allowed(chat_id):
@@ -29,37 +31,41 @@ async def handle_callback(
         return "OK"
     
     # Проверяем регистрацию
-    user_service = UserService()
-    if not user_service.is_registered(chat_id):
+    user_service = AsyncUserService()
+    if not await user_service.is_registered(chat_id):
         awaiting_password[chat_id] = True
         await tg.answer_callback(callback_id, "🔐 Требуется авторизация")
         await tg.send_message(chat_id, AUTH_REQUIRED)
         return "OK"
     
     if callback_data == "check_mail":
-        new_emails = mail.check_new_emails()
+        new_emails = await mail.check_new_emails(preview=True)
         if new_emails:
             for em in new_emails:
                 formatted = format_email_full(em)
-                await tg.send_email_with_attachments(chat_id, em, formatted)
+                await tg.send_email_with_attachments(
+                    chat_id, em, formatted, reply_markup=get_attachment_buttons(em)
+                )
+                close_attachments(em)
             await tg.answer_callback(callback_id, EMAILS_FOUND.format(count=len(new_emails)))
         else:
             await tg.answer_callback(callback_id, NO_EMAILS_MESSAGE)
     
     # Открыть список писем (страница)
     elif callback_data.startswith("mail_"):
-        page = int(callback_data.split("_")[1])
+        parts = callback_data.split("_")
+        page = int(parts[1])
         user_pages[chat_id] = page
         
-        emails, total, total_pages = mail.get_emails_page(page=page, per_page=10)
+        rendered = await render_email_page(chat_id, page, mail, refresh=len(parts) > 2)
         
-        if emails:
-            text = format_email_list(emails, page, total_pages, total)
-            await tg.send_message(
-                chat_id,
-                text,
-                reply_markup=get_email_list_buttons(emails, page, total_pages)
-            )
+        if rendered:
+            # Листание меняет то же сообщение, а не шлёт новое
+            result = None
+            if message_id is not None:
+                result = await tg.edit_message(chat_id, message_id, rendered["text"], rendered["reply_markup"])
+            if not result or not result.get("ok"):
+                await tg.send_message(chat_id, rendered["text"], reply_markup=rendered["reply_markup"])
             await tg.answer_callback(callback_id)
         else:
             await tg.answer_callback(callback_id, NO_EMAILS_FOUND)
@@ -67,7 +73,7 @@ async def handle_callback(
     # Открыть конкретное письмо по UID
     elif callback_data.startswith("email_"):
         uid = callback_data.split("_", 1)[1]
-        email_data = mail.get_email_by_uid(uid)
+        email_data = await mail.get_email_view(uid)
         
         if email_data:
             formatted = format_email_full(email_data)
@@ -76,12 +82,36 @@ async def handle_callback(
             await tg.send_message(
                 chat_id,
                 "👆 Письмо выше",
-                reply_markup=get_email_view_buttons(current_page)
+                reply_markup=get_email_view_buttons(current_page, email_data)
             )
             await tg.answer_callback(callback_id)
         else:
             await tg.answer_callback(callback_id, "❌ Письмо не найдено")
     
+    # Скачать одно вложение по номеру MIME-секции
+    elif callback_data.startswith("att_"):
+        _, uid, section = callback_data.split("_", 2)
+        # Отвечаем сразу: скачивание может занять дольше таймаута callback-запроса
+        await tg.answer_callback(callback_id, "⏳ Загружаю вложение")
+        key = mail.attachment_key(uid, section)
+        
+        # Файл уже загружался в Telegram — пересылаем по file_id, IMAP не трогаем
+        cached = tg.file_ids.get(key)
+        if cached:
+            result = await tg.send_document(chat_id, cached["file_id"], cached["filename"], f"📎 {cached['filename']}")
+            if result and result.get("ok"):
+                return "OK"
+            tg.file_ids.discard(key)
+        
+        att = await mail.get_attachment(uid, section)
+        if att:
+            try:
+                await tg.send_attachment(chat_id, att, f"📎 {att['filename']}", keys=(key,))
+            finally:
+                att["handle"].close()
+        else:
+            await tg.send_message(chat_id, "❌ Вложение не найдено")
+    
     elif callback_data == "menu":
         await tg.send_message(
             chat_id,
@@ -96,10 +126,11 @@ async def handle_callback(
             remaining = len(email_queues[chat_id])
             
             formatted = format_email_full(em)
+            close_attachments(em)
             await tg.send_message(
                 chat_id,
                 formatted,
-                reply_markup=get_next_button(remaining) if remaining > 0 else None
+                reply_markup=get_next_button(remaining, em)
             )
             await tg.answer_callback(callback_id)
         else:
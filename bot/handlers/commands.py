@@ -1,8 +1,8 @@
-from bot.services import TelegramService, MailService, UserService
-from bot.keyboards import get_main_menu, get_email_list_buttons
+from bot.services import TelegramService, AsyncMailService, AsyncUserService
+from bot.services.attachments import close_attachments
+from bot.keyboards import get_main_menu, get_attachment_buttons
 from bot.templates.messages import (
     format_email_full,
-    format_email_list,
     WELCOME_MESSAGE,
     HELP_MESSAGE,
     NO_ACCESS_MESSAGE,
@@ -14,6 +14,7 @@ from bot.templates.messages import (
     AUTH_SUCCESS,
     AUTH_FAILED,
 )
+from .pages import render_email_page
 
 # Состояния ожидания пароля
 awaiting_password: dict[str, bool] = {}
@@ -23,7 +24,7 @@ async def handle_command(
     command: str,
     chat_id: str,
     tg: TelegramService,
-    mail: MailService,
+    mail: AsyncMailService,
     email_queues: dict,
     user_data: dict = None
 ) -> str:
@@ -37,12 +38,12 @@ async def handle_command(
         return "OK"
     
     # Проверяем регистрацию пользователя
-    user_service = UserService()
+    user_service = AsyncUserService()
     
-    if not user_service.is_registered(chat_id):
+    if not await user_service.is_registered(chat_id):
         # Создаём пользователя если его нет
         ud = user_data or {}
-        user_service.create_unregistered_user(
+        await user_service.create_unregistered_user(
             chat_id,
             name=ud.get("name", "User"),
             firstname=ud.get("firstname"),
@@ -61,11 +62,14 @@ async def handle_command(
         )
     
     elif command == "/check":
-        new_emails = mail.check_new_emails()
+        new_emails = await mail.check_new_emails(preview=True)
         if new_emails:
             for em in new_emails:
                 formatted = format_email_full(em)
-                await tg.send_email_with_attachments(chat_id, em, formatted)
+                await tg.send_email_with_attachments(
+                    chat_id, em, formatted, reply_markup=get_attachment_buttons(em)
+                )
+                close_attachments(em)
             await tg.send_message(
                 chat_id,
                 EMAILS_SHOWN.format(count=len(new_emails)),
@@ -79,13 +83,12 @@ async def handle_command(
             )
     
     elif command == "/mail":
-        emails, total, total_pages = mail.get_emails_page(page=0, per_page=10)
-        if emails:
-            text = format_email_list(emails, 0, total_pages, total)
+        rendered = await render_email_page(chat_id, 0, mail)
+        if rendered:
             await tg.send_message(
                 chat_id,
-                text,
-                reply_markup=get_email_list_buttons(emails, 0, total_pages)
+                rendered["text"],
+                reply_markup=rendered["reply_markup"]
             )
         else:
             await tg.send_message(
@@ -124,12 +127,12 @@ async def handle_text_message(
     
     # Если пользователь вводит пароль
     if awaiting_password.get(chat_id):
-        user_service = UserService()
+        user_service = AsyncUserService()
         
         if user_service.check_password(text):
             # Пароль верный - регистрируем
             user_data = user_data or {}
-            user_service.register_user(
+            await user_service.register_user(
                 chat_id,
                 name=user_data.get("name", "User"),
                 firstname=user_data.get("firstname"),
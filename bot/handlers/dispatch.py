@@ -0,0 +1,52 @@
+from bot.services import TelegramService, AsyncMailService
+from .commands import handle_command, handle_text_message
+from .callbacks import handle_callback
+
+
+def update_chat_id(update: dict) -> str | None:
+    """Чат, к которому относится апдейт; None — апдейт не обрабатывается"""
+    if not isinstance(update, dict) or not isinstance(update.get("update_id"), int):
+        return None
+
+    if "callback_query" in update:
+        message = update["callback_query"].get("message") or {}
+    else:
+        message = update.get("message") or {}
+
+    chat_id = (message.get("chat") or {}).get("id")
+    return str(chat_id) if chat_id is not None else None
+
+
+async def handle_update(
+    update: dict,
+    tg: TelegramService,
+    mail: AsyncMailService,
+    email_queues: dict
+):
+    """Разбирает апдейт Telegram и вызывает нужный обработчик"""
+    chat_id = update_chat_id(update)
+    if chat_id is None:
+        return "OK"
+
+    if "callback_query" in update:
+        callback = update["callback_query"]
+        return await handle_callback(
+            callback.get("data", ""), callback["id"], chat_id,
+            tg, mail, email_queues,
+            callback["message"].get("message_id")
+        )
+
+    message = update["message"]
+    text = message.get("text", "")
+
+    user = message.get("from", {})
+    user_data = {
+        "firstname": user.get("first_name", ""),
+        "name": f"{user.get('first_name', '')} {user.get('last_name', '')}".strip(),
+        "username": user.get("username", ""),
+    }
+
+    if text.startswith("/"):
+        return await handle_command(text, chat_id, tg, mail, email_queues, user_data)
+
+    return await handle_text_message(text, chat_id, tg, user_data)
@@ -0,0 +1,88 @@
+import os
+import time
+from collections import OrderedDict
+
+from bot.services import AsyncMailService
+from bot.keyboards import get_email_list_buttons
+from bot.templates.messages import format_email_list
+
+PER_PAGE = 10
+
+
+class PageCache:
+    """Отрисованные страницы списка писем: (чат, страница, состояние ящика) -> текст и кнопки.
+
+    Состояние ящика (UIDVALIDITY, UIDNEXT, MESSAGES) запоминается на PAGE_CACHE_TTL
+    секунд: листание в это время не обращается к IMAP вовсе, а после — одним STATUS.
+    Страница перерисовывается, только если состояние изменилось.
+    """
+
+    def __init__(self, ttl: float = None, max_entries: int = None):
+        self.ttl = ttl or float(os.getenv("PAGE_CACHE_TTL", 30))
+        self.max_entries = max_entries or int(os.getenv("PAGE_CACHE_SIZE", 500))
+        self._pages: OrderedDict[tuple, dict] = OrderedDict()
+        self.state: tuple | None = None
+        self.state_checked = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def fresh_state(self) -> tuple | None:
+        """Состояние ящика, если оно проверялось не раньше ttl секунд назад"""
+        if self.state is not None and time.monotonic() - self.state_checked <= self.ttl:
+            return self.state
+        return None
+
+    def set_state(self, state: tuple | None):
+        self.state = state
+        self.state_checked = time.monotonic()
+
+    def get(self, chat_id: str, page: int, state: tuple) -> dict | None:
+        page_data = self._pages.get((chat_id, page, state))
+        if page_data is None:
+            self.misses += 1
+            return None
+        self._pages.move_to_end((chat_id, page, state))
+        self.hits += 1
+        return page_data
+
+    def set(self, chat_id: str, page: int, state: tuple, text: str, reply_markup: dict):
+        self._pages[(chat_id, page, state)] = {"text": text, "reply_markup": reply_markup}
+        self._pages.move_to_end((chat_id, page, state))
+        while len(self._pages) > self.max_entries:
+            self._pages.popitem(last=False)
+
+
+_page_cache: PageCache | None = None
+
+
+def get_page_cache() -> PageCache:
+    """Кэш создаётся при первом обращении, когда .env уже загружен"""
+    global _page_cache
+    if _page_cache is None:
+        _page_cache = PageCache()
+    return _page_cache
+
+
+async def render_email_page(chat_id: str, page: int, mail: AsyncMailService, refresh: bool = False) -> dict | None:
+    """Текст и кнопки страницы писем ({text, reply_markup}); None — писем нет"""
+    page_cache = get_page_cache()
+    state = None if refresh else page_cache.fresh_state()
+    if state is None:
+        state = await mail.mailbox_state()
+        page_cache.set_state(state)
+
+    if state is not None:
+        cached = page_cache.get(chat_id, page, state)
+        if cached:
+            return cached
+
+    emails, total, total_pages = await mail.get_email_summaries_page(page=page, per_page=PER_PAGE)
+    if not emails:
+        return None
+
+    text = format_email_list(emails, page, total_pages, total)
+    reply_markup = get_email_list_buttons(emails, page, total_pages)
+    # Без STATUS неизвестно, когда страница устареет, — такую не кэшируем
+    if state is not None:
+        page_cache.set(chat_id, page, state, text, reply_markup)
+    return {"text": text, "reply_markup": reply_markup}
@@ -1,3 +1,15 @@
-from .inline import get_main_menu, get_email_list_buttons, get_email_view_buttons, get_next_button
+from .inline import (
+    get_main_menu,
+    get_email_list_buttons,
+    get_email_view_buttons,
+    get_next_button,
+    get_attachment_buttons,
+)
 
-__all__ = ["get_main_menu", "get_email_list_buttons", "get_email_view_buttons", "get_next_button"]
+__all__ = [
+    "get_main_menu",
+    "get_email_list_buttons",
+    "get_email_view_buttons",
+    "get_next_button",
+    "get_attachment_buttons",
+]
@@ -1,11 +1,16 @@
-from bot.components import InlineButtonInterface
+from functools import lru_cache
+
+from bot.components import FrozenMarkup, InlineButtonInterface
+
+# Клавиатуры без данных письма собираются один раз и не меняются
+MAIN_MENU = InlineButtonInterface.frozen_markup_dict([
+    [{"text": "🔄 Проверить новые", "callback_data": "check_mail"}],
+    [{"text": "📬 Открыть почту", "callback_data": "mail_0"}]
+])
 
 
 def get_main_menu() -> dict:
-    return InlineButtonInterface.create_markup_dict([
-        [{"text": "🔄 Проверить новые", "callback_data": "check_mail"}],
-        [{"text": "📬 Открыть почту", "callback_data": "mail_0"}]
-    ])
+    return MAIN_MENU
 
 
 def get_email_list_buttons(emails: list, page: int, total_pages: int) -> dict:
@@ -33,21 +38,69 @@ def get_email_list_buttons(emails: list, page: int, total_pages: int) -> dict:
         nav_row.append({"text": "➡️", "callback_data": f"mail_{page + 1}"})
     
     buttons.append(nav_row)
-    buttons.append([{"text": "🔄 Обновить", "callback_data": f"mail_{page}"}])
+    # _r — обновление: состояние ящика проверяется сразу, без TTL кэша страниц
+    buttons.append([{"text": "🔄 Обновить", "callback_data": f"mail_{page}_r"}])
     
-    return InlineButtonInterface.create_markup_dict(buttons)
+    return InlineButtonInterface.build_markup_dict(buttons)
+
+
+def _attachment_rows(email_data: dict) -> list:
+    # Вложения скачиваются по отдельности: att_<uid>_<секция>
+    rows = []
+    for att in email_data.get("attachments", []):
+        if "section" not in att:
+            continue
+        name = att["filename"]
+        if len(name) > 30:
+            name = name[:27] + "..."
+        rows.append([{
+            "text": f"📥 {name}",
+            "callback_data": f"att_{email_data['uid']}_{att['section']}"
+        }])
+    return rows
 
 
-def get_email_view_buttons(page: int) -> dict:
-    return InlineButtonInterface.create_markup_dict([
+def get_attachment_buttons(email_data: dict) -> dict | None:
+    rows = _attachment_rows(email_data)
+    if rows:
+        return InlineButtonInterface.build_markup_dict(rows)
+    return None
+
+
+def _view_rows(page: int) -> list:
+    return [
         [{"text": "📋 К списку", "callback_data": f"mail_{page}"}],
-        [{"text": "🏠 Меню", "callback_data": "menu"}]
-    ])
+        [{"text": "🏠 Меню", "callback_data": "menu"}],
+    ]
+
+
+@lru_cache(maxsize=256)
+def _view_menu(page: int) -> FrozenMarkup:
+    return InlineButtonInterface.frozen_markup_dict(_view_rows(page))
+
+
+def get_email_view_buttons(page: int, email_data: dict = None) -> dict:
+    rows = _attachment_rows(email_data) if email_data else []
+    if not rows:
+        return _view_menu(page)
+    return InlineButtonInterface.build_markup_dict(rows + _view_rows(page))
+
+
+def _next_rows(count: int) -> list:
+    if count > 0:
+        return [[{"text": f"📬 Следующее письмо ({count})", "callback_data": "next_email"}]]
+    return []
+
+
+@lru_cache(maxsize=256)
+def _next_menu(count: int) -> FrozenMarkup:
+    return InlineButtonInterface.frozen_markup_dict(_next_rows(count))
 
 
-def get_next_button(count: int) -> dict | None:
+def get_next_button(count: int, email_data: dict = None) -> dict | None:
+    rows = _attachment_rows(email_data) if email_data else []
+    if rows:
+        return InlineButtonInterface.build_markup_dict(rows + _next_rows(count))
     if count > 0:
-        return InlineButtonInterface.create_markup_dict([
-            [{"text": f"📬 Следующее письмо ({count})", "callback_data": "next_email"}]
-        ])
+        return _next_menu(count)
     return None
@@ -1,5 +1,7 @@
 from .mail import MailService
+from .mail_async import AsyncMailService
 from .telegram import TelegramService
 from .user import UserService
+from .user_async import AsyncUserService
 
-__all__ = ["MailService", "TelegramService", "UserService"]
+__all__ = ["MailService", "AsyncMailService", "TelegramService", "UserService", "AsyncUserService"]
@@ -0,0 +1,215 @@
+import asyncio
+import os
+import re
+import time
+
+import aioimaplib
+
+from .imap_pool import NEW_MAIL_RE
+
+FETCH_PREFIX_RE = re.compile(rb"^(\d+) FETCH ")
+UIDVALIDITY_RE = re.compile(rb"UIDVALIDITY (\d+)")
+
+
+def to_imaplib_data(command: str, lines: list) -> list:
+    """Приводит строки ответа aioimaplib к формату data из imaplib"""
+    # Последняя строка — текст тегированного ответа
+    lines = lines[:-1]
+
+    if command == "SEARCH":
+        return [b" ".join(bytes(line) for line in lines)]
+
+    data = []
+    for line in lines:
+        if isinstance(line, bytearray):
+            data[-1] = (data[-1], bytes(line))
+        else:
+            data.append(FETCH_PREFIX_RE.sub(rb"\1 ", line))
+    return data
+
+
+class AsyncIMAPConnection:
+    """Соединение aioimaplib с интерфейсом команд как у imaplib"""
+
+    def __init__(self, client: aioimaplib.IMAP4):
+        self.client = client
+
+    @property
+    def capabilities(self) -> set:
+        return self.client.protocol.capabilities
+
+    async def uid(self, command: str, *args) -> tuple[str, list]:
+        command = command.upper()
+        if command == "SEARCH":
+            criteria = [arg for arg in args if arg is not None]
+            response = await self.client.uid_search(*criteria, charset=None)
+        else:
+            response = await self.client.uid(command.lower(), *args)
+        return response.result, to_imaplib_data(command, response.lines)
+
+    async def status(self, mailbox: str, names: str) -> tuple[str, list]:
+        response = await self.client.status(mailbox, names)
+        return response.result, to_imaplib_data("STATUS", response.lines)
+
+    async def noop(self) -> tuple[str, list]:
+        response = await self.client.noop()
+        return response.result, to_imaplib_data("NOOP", response.lines)
+
+    async def logout(self):
+        await self.client.logout()
+
+
+class AsyncIMAPConnectionPool:
+    """Асинхронный пул авторизованных IMAP-сессий с выбранным ящиком"""
+
+    def __init__(
+        self,
+        server: str,
+        email_addr: str,
+        password: str,
+        mailbox: str = "INBOX",
+        size: int = None,
+        check_after: float = None,
+        timeout: float = None,
+    ):
+        self.server = server
+        self.email_addr = email_addr
+        self.password = password
+        self.mailbox = mailbox
+        self.size = size or int(os.getenv("IMAP_POOL_SIZE", 2))
+        self.check_after = check_after if check_after is not None else float(os.getenv("IMAP_POOL_CHECK_AFTER", 60))
+        self.timeout = timeout or float(os.getenv("IMAP_TIMEOUT", 30))
+
+        self.uidvalidity: int | None = None
+
+        self._idle: list[tuple[AsyncIMAPConnection, float]] = []
+        self._slots: asyncio.Semaphore | None = None
+        self._closed = False
+
+    async def _connect(self) -> aioimaplib.IMAP4:
+        client = aioimaplib.IMAP4_SSL(self.server, 993, timeout=self.timeout)
+        await client.wait_hello_from_server()
+        return client
+
+    async def _open(self) -> AsyncIMAPConnection:
+        client = await self._connect()
+        response = await client.login(self.email_addr, self.password)
+        if response.result != "OK":
+            raise aioimaplib.Error(f"ошибка авторизации: {response.lines}")
+        response = await client.select(self.mailbox)
+        for line in response.lines:
+            match = UIDVALIDITY_RE.search(bytes(line))
+            if match:
+                self.uidvalidity = int(match.group(1))
+        return AsyncIMAPConnection(client)
+
+    @staticmethod
+    async def _is_alive(mail: AsyncIMAPConnection) -> bool:
+        try:
+            return (await mail.noop())[0] == "OK"
+        except (aioimaplib.AioImapException, asyncio.TimeoutError, OSError):
+            return False
+
+    @staticmethod
+    async def _discard(mail: AsyncIMAPConnection):
+        try:
+            await mail.logout()
+        except Exception:
+            pass
+
+    async def acquire(self) -> AsyncIMAPConnection:
+        # Семафор создаётся лениво, чтобы привязаться к работающему event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        await self._slots.acquire()
+        try:
+            while self._idle:
+                mail, last_used = self._idle.pop()
+                if time.monotonic() - last_used < self.check_after or await self._is_alive(mail):
+                    return mail
+                await self._discard(mail)
+            return await self._open()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, mail: AsyncIMAPConnection, broken: bool = False):
+        if broken or self._closed:
+            await self._discard(mail)
+        else:
+            self._idle.append((mail, time.monotonic()))
+        self._slots.release()
+
+    async def run(self, func, *args):
+        """Выполняет await func(mail, *args) на соединении из пула, при обрыве переподключается один раз"""
+        for attempt in range(2):
+            mail = await self.acquire()
+            try:
+                result = await func(mail, *args)
+            except (aioimaplib.AioImapException, asyncio.TimeoutError, OSError):
+                await self.release(mail, broken=True)
+                if attempt:
+                    raise
+                continue
+            except BaseException:
+                await self.release(mail)
+                raise
+            await self.release(mail)
+            return result
+
+    async def close(self):
+        self._closed = True
+        while self._idle:
+            mail, _ = self._idle.pop()
+            await self._discard(mail)
+
+
+class AsyncIMAPIdleListener:
+    """IDLE-сессия в event loop, вызывает on_new_mail при появлении писем"""
+
+    def __init__(self, pool: AsyncIMAPConnectionPool, on_new_mail, renew_interval: float = None):
+        self.pool = pool
+        self.on_new_mail = on_new_mail
+        self.renew_interval = renew_interval or float(os.getenv("IMAP_IDLE_RENEW", 25 * 60))
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def run(self):
+        backoff = 1
+        while True:
+            mail = None
+            try:
+                mail = await self.pool._open()
+                if "IDLE" not in mail.capabilities:
+                    print("⚠️ Сервер не поддерживает IDLE, остаётся только опрос")
+                    return
+                backoff = 1
+                while True:
+                    await self._idle_once(mail.client)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Ошибка IDLE: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                if mail is not None:
+                    await AsyncIMAPConnectionPool._discard(mail)
+
+    async def _idle_once(self, client: aioimaplib.IMAP4):
+        idle = await client.idle_start(timeout=self.renew_interval)
+        while client.has_pending_idle():
+            push = await client.wait_server_push(timeout=self.renew_interval + self.pool.timeout)
+            if push == aioimaplib.STOP_WAIT_SERVER_PUSH:
+                client.idle_done()
+                await asyncio.wait_for(idle, self.pool.timeout)
+                break
+            if any(NEW_MAIL_RE.match(b"* " + bytes(line)) for line in push):
+                self.on_new_mail()
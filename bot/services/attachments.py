@@ -0,0 +1,174 @@
+import binascii
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Iterator
+
+MAX_ATTACHMENT_SIZE = 50 * 1024 * 1024
+# Сколько символов закодированного payload декодируется за раз
+CHUNK_CHARS = 64 * 1024
+
+
+class AttachmentHandle:
+    """Вложение во временном файле: в памяти до ATTACHMENT_SPOOL_MEMORY байт, дальше на диске"""
+
+    def __init__(self, filename: str, content_type: str = "application/octet-stream"):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = tempfile.SpooledTemporaryFile(
+            max_size=int(os.getenv("ATTACHMENT_SPOOL_MEMORY", 1024 * 1024))
+        )
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest() if self._hash is not None else self._digest
+
+    def open(self) -> BinaryIO:
+        """Поток с начала файла для отправки; у каждого потока своя позиция чтения"""
+        return io.BufferedReader(AttachmentReader(self))
+
+    def read(self) -> bytes:
+        return self.open().read()
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        # seek и read без await между ними — параллельные потоки в event loop не мешают друг другу
+        self._file.seek(offset)
+        return self._file.read(size)
+
+    def close(self):
+        self._file.close()
+
+    def __getstate__(self) -> dict:
+        """Для передачи из процесса-воркера: содержимое уходит в именованный временный файл"""
+        fd, path = tempfile.mkstemp(prefix="attachment-")
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(self.open(), f)
+        self.close()
+        return {
+            "filename": self.filename,
+            "content_type": self.content_type,
+            "size": self.size,
+            "sha256": self.sha256,
+            "path": path,
+        }
+
+    def __setstate__(self, state: dict):
+        self.filename = state["filename"]
+        self.content_type = state["content_type"]
+        self.size = state["size"]
+        self._hash = None
+        self._digest = state["sha256"]
+        # Файл удаляется сразу: открытый дескриптор продолжает его читать
+        self._file = open(state["path"], "rb")
+        os.unlink(state["path"])
+
+
+class AttachmentReader(io.RawIOBase):
+    """Чтение AttachmentHandle с собственной позицией: одно вложение уходит в несколько чатов сразу"""
+
+    def __init__(self, handle: AttachmentHandle):
+        self.handle = handle
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.handle.size
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        data = self.handle.read_at(self.position, len(buffer))
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+class TransferDecoder:
+    """Потоковое декодирование base64 / quoted-printable кусками произвольной длины"""
+
+    def __init__(self, encoding: str):
+        self.encoding = (encoding or "").strip().lower()
+        self._pending = b""
+
+    def feed(self, chunk: bytes | str) -> bytes:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("raw-unicode-escape")
+
+        if self.encoding == "base64":
+            data = self._pending + b"".join(chunk.split())
+            usable = len(data) - len(data) % 4
+            self._pending = data[usable:]
+            return binascii.a2b_base64(data[:usable]) if usable else b""
+
+        if self.encoding == "quoted-printable":
+            # Декодируются только целые строки, чтобы не разрывать =XX и мягкие переносы
+            data = self._pending + chunk
+            cut = data.rfind(b"\n") + 1
+            self._pending = data[cut:]
+            return binascii.a2b_qp(data[:cut]) if cut else b""
+
+        return chunk
+
+    def flush(self) -> bytes:
+        pending, self._pending = self._pending, b""
+        if self.encoding == "base64":
+            if not pending.rstrip(b"="):
+                return b""
+            return binascii.a2b_base64(pending + b"=" * (-len(pending) % 4))
+        if self.encoding == "quoted-printable":
+            return binascii.a2b_qp(pending)
+        return pending
+
+
+def iter_decoded_payload(part) -> Iterator[bytes]:
+    """Декодирует payload MIME-части кусками, не собирая его целиком в bytes"""
+    encoding = str(part.get("Content-Transfer-Encoding", "")).strip().lower()
+    payload = part.get_payload(decode=False)
+
+    if not isinstance(payload, str) or encoding not in ("base64", "quoted-printable"):
+        data = part.get_payload(decode=True)
+        if data:
+            yield data
+        return
+
+    decoder = TransferDecoder(encoding)
+    for start in range(0, len(payload), CHUNK_CHARS):
+        yield decoder.feed(payload[start:start + CHUNK_CHARS])
+    yield decoder.flush()
+
+
+def spool_attachment(part, filename: str) -> AttachmentHandle | None:
+    """Пишет вложение во временный файл; None, если оно больше MAX_ATTACHMENT_SIZE"""
+    handle = AttachmentHandle(filename, part.get_content_type())
+    for chunk in iter_decoded_payload(part):
+        handle.write(chunk)
+        if handle.size > MAX_ATTACHMENT_SIZE:
+            handle.close()
+            return None
+    return handle
+
+
+def close_attachments(email_data: dict):
+    for att in email_data.get("attachments", []):
+        if att.get("handle") is not None:
+            att["handle"].close()
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def writable_path(name: str) -> str:
+    # В serverless (Vercel, Lambda) рабочая папка только для чтения — писать можно во временную
+    if os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        return os.path.join(tempfile.gettempdir(), name.lstrip("."))
+    return name
+
+
+class MessageCache:
+    """Локальный кэш писем на диске: сырые байты и метаданные, вытеснение LRU.
+
+    Ключ — хэш (аккаунт, ящик, UIDVALIDITY, UID): при смене UIDVALIDITY
+    старые записи просто перестают находиться и со временем вытесняются.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = directory or os.getenv("MAIL_CACHE_DIR") or writable_path(".mail_cache")
+        self.max_bytes = max_bytes or int(os.getenv("MAIL_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._index: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._scan()
+
+    @staticmethod
+    def key(account: str, mailbox: str, uidvalidity: int, uid: str) -> str:
+        return hashlib.sha256(f"{account}\0{mailbox}\0{uidvalidity}\0{uid}".encode()).hexdigest()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name[:2], name)
+
+    def _scan(self):
+        """Восстанавливает индекс с диска, порядок LRU — по времени последнего доступа"""
+        entries = []
+        try:
+            for subdir in os.scandir(self.directory):
+                if subdir.is_dir():
+                    for entry in os.scandir(subdir.path):
+                        if entry.name.endswith(".tmp"):
+                            continue
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name, stat.st_size))
+        except OSError:
+            return
+
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._size += size
+
+    def _read(self, name: str) -> bytes | None:
+        with self._lock:
+            if name not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(name)
+
+        path = self._path(name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._size -= self._index.pop(name, 0)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def _write(self, name: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path(name)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Ошибка записи в кэш писем: {e}")
+            return
+
+        with self._lock:
+            self._size += len(data) - self._index.pop(name, 0)
+            self._index[name] = len(data)
+            evicted = []
+            while self._size > self.max_bytes and self._index:
+                old_name, old_size = self._index.popitem(last=False)
+                self._size -= old_size
+                evicted.append(old_name)
+
+        for old_name in evicted:
+            try:
+                os.remove(self._path(old_name))
+            except OSError:
+                pass
+
+    def get_raw(self, key: str) -> bytes | None:
+        return self._read(f"{key}.eml")
+
+    def put_raw(self, key: str, raw: bytes):
+        self._write(f"{key}.eml", raw)
+
+    def get_meta(self, key: str) -> dict | None:
+        data = self._read(f"{key}.json")
+        return json.loads(data) if data is not None else None
+
+    def put_meta(self, key: str, meta: dict):
+        self._write(f"{key}.json", json.dumps(meta, ensure_ascii=False).encode())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._index),
+                "bytes": self._size,
+            }
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .cache import writable_path
+
+
+class FileIdCache:
+    """file_id файлов, уже загруженных в Telegram, с сохранением в JSON.
+
+    Один файл доступен по нескольким ключам: по sha256 содержимого и по
+    (аккаунт, ящик, UIDVALIDITY, UID, секция) — второй известен ещё до
+    скачивания вложения с IMAP. Старые записи вытесняются по LRU.
+    Файл переписывается не чаще раза в flush_interval секунд и в flush().
+    """
+
+    def __init__(self, path: str = None, max_entries: int = None, flush_interval: float = None):
+        self.path = path or os.getenv("TELEGRAM_FILE_ID_CACHE") or writable_path(".file_ids.json")
+        self.max_entries = max_entries or int(os.getenv("TELEGRAM_FILE_ID_CACHE_SIZE", 5000))
+        self.flush_interval = (
+            flush_interval if flush_interval is not None else float(os.getenv("TELEGRAM_FILE_ID_FLUSH", 5))
+        )
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, dict] = OrderedDict(self._load())
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    @staticmethod
+    def content_key(sha256: str) -> str:
+        return f"sha256:{sha256}"
+
+    @staticmethod
+    def section_key(account: str, mailbox: str, uidvalidity: int, uid: str, section: str) -> str:
+        return f"section:{account}/{mailbox}/{uidvalidity}/{uid}/{section}"
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Не удалось сохранить кэш file_id: {e}")
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _changed(self):
+        # Альбом приносит до 10 file_id подряд — файл переписывается один раз, а не на каждый
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= self.flush_interval:
+            self._save()
+
+    def flush(self):
+        """Сохраняет изменения, отложенные с последней записи"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def get(self, *keys: str | None) -> dict | None:
+        """Первая найденная запись {file_id, filename} по любому из ключей"""
+        with self._lock:
+            for key in keys:
+                if key and key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, file_id: str, filename: str, *keys: str | None):
+        with self._lock:
+            for key in keys:
+                if key:
+                    self._entries[key] = {"file_id": file_id, "filename": filename}
+                    self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._changed()
+
+    def discard(self, *keys: str | None):
+        """Убирает устаревший file_id (Telegram его не принял)"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self._changed()
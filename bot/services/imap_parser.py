@@ -0,0 +1,185 @@
+import re
+from urllib.parse import unquote
+
+TOKEN_RE = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|\{(\d+)\}$|([^\s()"\[]+(?:\[[^\]]*\](?:<[^>]*>)?)?))')
+QUOTED_ESCAPE_RE = re.compile(rb'\\(.)')
+
+
+class Literal(bytes):
+    """Строка, пришедшая IMAP-литералом {n}"""
+
+
+def _segments(msg_data) -> list:
+    """Разворачивает ответ imaplib в поток текстовых кусков и литералов"""
+    segments = []
+    for item in msg_data:
+        if isinstance(item, tuple):
+            segments.append(item[0])
+            segments.append(Literal(item[1]))
+        elif item is not None:
+            segments.append(item)
+    return segments
+
+
+def _tokenize(msg_data) -> list:
+    tokens = []
+    for segment in _segments(msg_data):
+        if isinstance(segment, Literal):
+            tokens.append(segment)
+            continue
+        pos = 0
+        while pos < len(segment):
+            match = TOKEN_RE.match(segment, pos)
+            if not match or match.end() == pos:
+                break
+            pos = match.end()
+            opening, closing, quoted, literal_size, atom = match.groups()
+            if opening:
+                tokens.append("(")
+            elif closing:
+                tokens.append(")")
+            elif quoted is not None:
+                tokens.append(QUOTED_ESCAPE_RE.sub(rb"\1", quoted))
+            elif literal_size is not None:
+                continue
+            elif atom is not None:
+                tokens.append(None if atom.upper() == b"NIL" else atom)
+    return tokens
+
+
+def _build(tokens: list, pos: int) -> tuple[list, int]:
+    result = []
+    while pos < len(tokens):
+        token = tokens[pos]
+        pos += 1
+        if token == "(":
+            nested, pos = _build(tokens, pos)
+            result.append(nested)
+        elif token == ")":
+            return result, pos
+        else:
+            result.append(token)
+    return result, pos
+
+
+def parse_fetch_response(msg_data) -> list[dict]:
+    """Разбирает ответ FETCH в список {ИМЯ: значение} по каждому письму"""
+    values, _ = _build(_tokenize(msg_data), 0)
+
+    messages = []
+    for value in values:
+        if not isinstance(value, list):
+            continue
+        items = {}
+        for i in range(0, len(value) - 1, 2):
+            name = value[i].decode().upper()
+            items[name] = value[i + 1]
+        messages.append(items)
+    return messages
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    return value.decode("utf-8", errors="replace")
+
+
+def format_address(address: list) -> str:
+    name, _, mailbox, host = address[:4]
+    addr = f"{_text(mailbox)}@{_text(host)}" if host else _text(mailbox)
+    name = _text(name)
+    return f"{name} <{addr}>" if name else addr
+
+
+def parse_envelope(envelope: list) -> dict:
+    date, subject, from_ = envelope[0], envelope[1], envelope[2]
+    return {
+        "date": _text(date),
+        "subject": _text(subject),
+        "from": ", ".join(format_address(a) for a in from_ or []),
+    }
+
+
+def _params(value) -> dict:
+    if not isinstance(value, list):
+        return {}
+    params = {}
+    for i in range(0, len(value) - 1, 2):
+        key = _text(value[i]).lower()
+        params[key] = _text(value[i + 1])
+    return params
+
+
+def _filename(params: dict) -> str | None:
+    for key in ("filename", "name"):
+        if key in params:
+            return params[key]
+        if f"{key}*" in params:
+            # RFC 2231: charset'language'percent-encoded
+            value = params[f"{key}*"]
+            if value.count("'") < 2:
+                return unquote(value)
+            charset, _, value = value.split("'", 2)
+            return unquote(value, encoding=charset or "utf-8", errors="replace")
+    return None
+
+
+def walk_bodystructure(structure: list, section: str = "") -> list[dict]:
+    """Плоский список листовых частей BODYSTRUCTURE с номерами секций"""
+    if structure and isinstance(structure[0], list):
+        parts = []
+        index = 1
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            parts.extend(walk_bodystructure(child, f"{section}.{index}" if section else str(index)))
+            index += 1
+        return parts
+
+    maintype = _text(structure[0]).lower()
+    subtype = _text(structure[1]).lower()
+    content_type = f"{maintype}/{subtype}"
+
+    # Расширенные поля идут после базовых; text/* и message/rfc822 добавляют свои
+    if content_type == "message/rfc822":
+        extension = 10
+    elif maintype == "text":
+        extension = 8
+    else:
+        extension = 7
+
+    disposition = None
+    disposition_params = {}
+    if len(structure) > extension + 1 and isinstance(structure[extension + 1], list):
+        disposition = _text(structure[extension + 1][0]).lower()
+        disposition_params = _params(structure[extension + 1][1])
+
+    params = _params(structure[2])
+    size = structure[6]
+
+    return [{
+        "section": section or "1",
+        "content_type": content_type,
+        "charset": params.get("charset"),
+        "encoding": _text(structure[5]).lower(),
+        "size": int(size) if size is not None else 0,
+        "disposition": disposition,
+        "filename": _filename(disposition_params) or _filename(params),
+    }]
+
+
+def attachment_parts(structure: list) -> list[dict]:
+    """Части, которые get_attachments считает вложениями"""
+    return [
+        part for part in walk_bodystructure(structure)
+        if part["disposition"] in ("attachment", "inline") and part["filename"]
+    ]
+
+
+def text_parts(structure: list) -> list[dict]:
+    """Текстовые части тела письма, из которых get_email_body собирает текст"""
+    return [
+        part for part in walk_bodystructure(structure)
+        if part["content_type"] in ("text/plain", "text/html") and part["disposition"] != "attachment"
+    ]
+
@@ -0,0 +1,196 @@
+import imaplib
+import os
+import queue
+import re
+import select
+import ssl
+import threading
+import time
+
+
+class IMAPConnectionPool:
+    """Пул авторизованных IMAP-сессий с заранее выбранным ящиком"""
+
+    def __init__(
+        self,
+        server: str,
+        email_addr: str,
+        password: str,
+        mailbox: str = "INBOX",
+        size: int = None,
+        check_after: float = None,
+        timeout: float = None,
+    ):
+        self.server = server
+        self.email_addr = email_addr
+        self.password = password
+        self.mailbox = mailbox
+        self.size = size or int(os.getenv("IMAP_POOL_SIZE", 2))
+        # Соединение, простоявшее дольше check_after секунд, проверяется NOOP перед выдачей
+        self.check_after = check_after if check_after is not None else float(os.getenv("IMAP_POOL_CHECK_AFTER", 60))
+        self.timeout = timeout or float(os.getenv("IMAP_TIMEOUT", 30))
+
+        # UIDVALIDITY выбранного ящика, известен после первого SELECT
+        self.uidvalidity: int | None = None
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+
+    def _connect(self) -> imaplib.IMAP4:
+        return imaplib.IMAP4_SSL(self.server, 993, timeout=self.timeout)
+
+    def _open(self) -> imaplib.IMAP4:
+        mail = self._connect()
+        mail.login(self.email_addr, self.password)
+        mail.select(self.mailbox)
+        uidvalidity = mail.untagged_responses.get("UIDVALIDITY")
+        if uidvalidity:
+            self.uidvalidity = int(uidvalidity[-1])
+        return mail
+
+    @staticmethod
+    def _is_alive(mail: imaplib.IMAP4_SSL) -> bool:
+        try:
+            return mail.noop()[0] == "OK"
+        except (imaplib.IMAP4.error, OSError):
+            return False
+
+    @staticmethod
+    def _discard(mail: imaplib.IMAP4_SSL):
+        try:
+            mail.logout()
+        except Exception:
+            pass
+
+    def acquire(self) -> imaplib.IMAP4_SSL:
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    mail, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._open()
+
+                if time.monotonic() - last_used < self.check_after or self._is_alive(mail):
+                    return mail
+                self._discard(mail)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, mail: imaplib.IMAP4_SSL, broken: bool = False):
+        if broken or self._closed:
+            self._discard(mail)
+        else:
+            self._idle.put((mail, time.monotonic()))
+        self._slots.release()
+
+    def run(self, func, *args):
+        """Выполняет func(mail, *args) на соединении из пула, при обрыве переподключается один раз"""
+        for attempt in range(2):
+            mail = self.acquire()
+            try:
+                result = func(mail, *args)
+            except (imaplib.IMAP4.abort, OSError):
+                self.release(mail, broken=True)
+                if attempt:
+                    raise
+                continue
+            except BaseException:
+                self.release(mail)
+                raise
+            self.release(mail)
+            return result
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                mail, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(mail)
+
+
+NEW_MAIL_RE = re.compile(rb"^\* \d+ (EXISTS|RECENT)", re.IGNORECASE)
+
+
+class _LineReader:
+    """Построчное чтение из сокета с таймаутом (IDLE-ответы читаются в обход imaplib)"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buf = b""
+
+    def readline(self, timeout: float) -> bytes | None:
+        while b"\r\n" not in self.buf:
+            pending = isinstance(self.sock, ssl.SSLSocket) and self.sock.pending()
+            if not pending:
+                readable, _, _ = select.select([self.sock], [], [], timeout)
+                if not readable:
+                    return None
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise imaplib.IMAP4.abort("сервер закрыл соединение")
+            self.buf += chunk
+        line, _, self.buf = self.buf.partition(b"\r\n")
+        return line
+
+
+class IMAPIdleListener(threading.Thread):
+    """Держит отдельную IDLE-сессию и вызывает on_new_mail при появлении писем"""
+
+    def __init__(self, pool: IMAPConnectionPool, on_new_mail, renew_interval: float = None):
+        super().__init__(name="imap-idle", daemon=True)
+        self.pool = pool
+        self.on_new_mail = on_new_mail
+        # RFC 2177: IDLE нужно перезапускать раньше 29 минут
+        self.renew_interval = renew_interval or float(os.getenv("IMAP_IDLE_RENEW", 25 * 60))
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        backoff = 1
+        while not self._stop_event.is_set():
+            mail = None
+            try:
+                mail = self.pool._open()
+                if "IDLE" not in mail.capabilities:
+                    print("⚠️ Сервер не поддерживает IDLE, остаётся только опрос")
+                    return
+                backoff = 1
+                while not self._stop_event.is_set():
+                    self._idle_once(mail)
+            except Exception as e:
+                print(f"Ошибка IDLE: {e}")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                if mail is not None:
+                    IMAPConnectionPool._discard(mail)
+
+    def _idle_once(self, mail: imaplib.IMAP4_SSL):
+        reader = _LineReader(mail.socket())
+        tag = mail._new_tag()
+        mail.send(tag + b" IDLE\r\n")
+
+        line = reader.readline(self.pool.timeout)
+        if line is None or not line.startswith(b"+"):
+            raise imaplib.IMAP4.abort(f"IDLE отклонён: {line!r}")
+
+        deadline = time.monotonic() + self.renew_interval
+        while not self._stop_event.is_set() and time.monotonic() < deadline:
+            line = reader.readline(1.0)
+            if line is not None and NEW_MAIL_RE.match(line):
+                self.on_new_mail()
+
+        mail.send(b"DONE\r\n")
+        while True:
+            line = reader.readline(self.pool.timeout)
+            if line is None:
+                raise imaplib.IMAP4.abort("нет ответа на DONE")
+            if line.startswith(tag):
+                break
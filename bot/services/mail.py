@@ -1,24 +1,55 @@
-import imaplib
 import email
 from email.header import decode_header
 from datetime import datetime, timedelta
 import os
 import re
 import html
+import threading
+from typing import TYPE_CHECKING
 
-import html2text
+from .imap_pool import IMAPConnectionPool, IMAPIdleListener
+from .imap_parser import attachment_parts, parse_envelope, parse_fetch_response, text_parts
+from .sync import IncrementalSync, parse_status
+from .cache import MessageCache
+from .attachments import MAX_ATTACHMENT_SIZE, AttachmentHandle, TransferDecoder, spool_attachment
+from .parsing import ParserPool
+from .file_ids import FileIdCache
+
+if TYPE_CHECKING:
+    import html2text
+
+_local = threading.local()
+
+
+def _snapshot(state: dict) -> dict:
+    return {name: value.copy() if isinstance(value, (list, dict)) else value for name, value in state.items()}
+
+
+def _converter() -> "html2text.HTML2Text":
+    """HTML2Text на поток: создаётся один раз и сбрасывается в исходное состояние перед письмом"""
+    converter = getattr(_local, "converter", None)
+    if converter is None:
+        # Импорт при первом HTML-письме, а не при холодном старте
+        import html2text
+        
+        converter = html2text.HTML2Text()
+        converter.ignore_links = False
+        converter.ignore_images = True
+        converter.body_width = 0
+        _local.converter = converter
+        _local.state = _snapshot(vars(converter))
+        return converter
+    
+    # Незакрытые списки, цитаты и ссылки прошлого письма не должны протечь в следующее
+    converter.__dict__.update(_snapshot(_local.state))
+    return converter
 
 
 def html_to_text(html_content: str) -> str:
     if not html_content:
         return ""
     
-    h = html2text.HTML2Text()
-    h.ignore_links = False
-    h.ignore_images = True
-    h.body_width = 0
-    
-    return h.handle(html_content).strip()
+    return _converter().handle(html_content).strip()
 
 
 def decode_header_value(header) -> str:
@@ -87,12 +118,12 @@ def get_attachments(msg) -> list:
                     filename = decode_header_value(filename)
                     
                     try:
-                        payload = part.get_payload(decode=True)
-                        if payload and len(payload) <= 50 * 1024 * 1024:
+                        handle = spool_attachment(part, filename)
+                        if handle and handle.size:
                             attachments.append({
                                 "filename": filename,
-                                "data": payload,
-                                "size": len(payload)
+                                "handle": handle,
+                                "size": handle.size
                             })
                     except Exception as e:
                         print(f"Ошибка извлечения вложения {filename}: {e}")
@@ -100,162 +131,572 @@ def get_attachments(msg) -> list:
     return attachments
 
 
+UID_RE = re.compile(rb"UID (\d+)")
+
+
+def messages_by_uid(msg_data: list) -> dict:
+    """Сопоставляет литералы ответа UID FETCH с UID писем"""
+    messages = {}
+    for i, item in enumerate(msg_data):
+        if not isinstance(item, tuple):
+            continue
+        match = UID_RE.search(item[0])
+        # Сервер может прислать UID после литерала — тогда он в хвосте ответа
+        if not match and i + 1 < len(msg_data) and isinstance(msg_data[i + 1], bytes):
+            match = UID_RE.search(msg_data[i + 1])
+        if match:
+            messages[match.group(1)] = item[1]
+    return messages
+
+
+def uid_set(uids: list) -> str:
+    return b",".join(uids).decode()
+
+
+def fetch_messages(mail, uids: list, items: str = "BODY.PEEK[]") -> dict:
+    """Забирает письма одним UID FETCH по набору UID, возвращает {uid: raw}"""
+    if not uids:
+        return {}
+    
+    status, msg_data = mail.uid("FETCH", uid_set(uids), f"(UID {items})")
+    return messages_by_uid(msg_data) if status == "OK" else {}
+
+
+# Ниже — общая для MailService и AsyncMailService логика без ввода-вывода:
+# сервисы отличаются только тем, как выполняют команды IMAP и разбор писем
+
+def search_uids(status: str, messages: list) -> list:
+    """UID из ответа UID SEARCH; пустой список, если поиск не удался"""
+    return messages[0].split() if status == "OK" else []
+
+
+def status_values(status: str, data: list) -> dict | None:
+    return parse_status(data) if status == "OK" else None
+
+
+def since_criteria(days_back: int) -> str:
+    since_date = (datetime.now() - timedelta(days=days_back)).strftime("%d-%b-%Y")
+    return f'(SINCE "{since_date}")'
+
+
+def newest_slice(uids: list, offset: int, limit: int) -> tuple[list, int]:
+    """limit писем от новых к старым, начиная с offset, и общее число писем"""
+    uids = list(reversed(uids))
+    return uids[offset:offset + limit], len(uids)
+
+
+def with_pages(items: list, total: int, per_page: int) -> tuple[list, int, int]:
+    total_pages = (total + per_page - 1) // per_page if total > 0 else 0
+    return items, total, total_pages
+
+
+def parse_jobs(raw_emails: dict, uids: list) -> tuple[list, list]:
+    """Аргументы parse_email для скачанных писем в порядке uids"""
+    uids = [uid for uid in uids if uid in raw_emails]
+    return [raw_emails[uid] for uid in uids], uids
+
+
+MAILBOX_STATE_ITEMS = "(MESSAGES UIDVALIDITY UIDNEXT)"
+
+
+def mailbox_state_key(values: dict | None) -> tuple | None:
+    if values is None:
+        return None
+    return values.get("UIDVALIDITY"), values.get("UIDNEXT"), values.get("MESSAGES")
+
+
+SUMMARY_ITEMS = "(UID ENVELOPE BODYSTRUCTURE RFC822.SIZE)"
+
+
+def encoded_size(size: int, encoding: str) -> int:
+    """Примерный размер части после декодирования transfer-encoding"""
+    if encoding == "base64":
+        return size * 3 // 4
+    return size
+
+
+def section_items(parts: list) -> str:
+    return "(UID " + " ".join(f"BODY.PEEK[{part['section']}]" for part in parts) + ")"
+
+
+def item_sections(items: dict) -> dict:
+    """Литералы BODY[секция] и BODY[секция]<offset> одного письма: {секция: bytes}"""
+    return {
+        name[5:name.index("]")]: value
+        for name, value in items.items()
+        if name.startswith("BODY[") and isinstance(value, bytes)
+    }
+
+
+def section_bodies(msg_data: list) -> dict:
+    """Литералы BODY[секция] из ответа FETCH: {секция: bytes}"""
+    bodies = {}
+    for items in parse_fetch_response(msg_data):
+        bodies.update(item_sections(items))
+    return bodies
+
+
+def decode_text_part(data: bytes, part: dict, partial: bool = False) -> str:
+    """Декодирует текстовую часть; partial — это префикс, и хвост может быть оборван"""
+    decoder = TransferDecoder(part["encoding"])
+    payload = decoder.feed(data)
+    if not partial:
+        payload += decoder.flush()
+    try:
+        text = payload.decode(part["charset"] or "utf-8", errors="replace")
+    except LookupError:
+        text = payload.decode("utf-8", errors="replace")
+    # Префикс мог разрезать многобайтовый символ
+    return text.rstrip("\ufffd") if partial else text
+
+
+def preview_part(parts: list) -> dict | None:
+    """Часть для превью: text/plain, если есть, иначе text/html (как в get_email_body)"""
+    plain = [part for part in parts if part["content_type"] == "text/plain"]
+    html_parts = [part for part in parts if part["content_type"] == "text/html"]
+    candidates = plain or html_parts
+    return candidates[-1] if candidates else None
+
+
+def preview_bytes(part: dict) -> int:
+    """Сколько байт части скачать, чтобы хватило на шаблон уведомления"""
+    if part["content_type"] == "text/html":
+        size = int(os.getenv("MAIL_PREVIEW_HTML_BYTES", 64 * 1024))
+    else:
+        size = int(os.getenv("MAIL_PREVIEW_BYTES", 10 * 1024))
+    
+    if part["encoding"] == "base64":
+        return (size + 2) // 3 * 4
+    if part["encoding"] == "quoted-printable":
+        return size * 3
+    return size
+
+
+def preview_queries(summaries: dict, mark_seen: bool) -> dict:
+    """Группирует письма по одинаковому запросу префикса: {items: [uid]}"""
+    # BODY[...] без PEEK заодно ставит \Seen, как раньше RFC822
+    fetch = "BODY" if mark_seen else "BODY.PEEK"
+    queries = {}
+    for uid, summary in summaries.items():
+        part = preview_part(summary["text_parts"])
+        if part is None:
+            continue
+        items = f"(UID {fetch}[{part['section']}]<0.{preview_bytes(part)}>)"
+        queries.setdefault(items, []).append(uid)
+    return queries
+
+
+def preview_bodies(msg_data: list) -> dict:
+    """Префиксы частей из ответа FETCH: {uid: {секция: bytes}}"""
+    return {
+        items["UID"]: item_sections(items)
+        for items in parse_fetch_response(msg_data) if "UID" in items
+    }
+
+
+def unread_uids(summaries: dict, bodies: dict) -> list:
+    """Письма без текстовой части: BODY[...] не пометил их прочитанными, нужен STORE"""
+    return [uid for uid in summaries if uid not in bodies]
+
+
+def preview_jobs(uids: list, summaries: dict, bodies: dict) -> tuple[list, list]:
+    """Аргументы build_preview в порядке uids"""
+    uids = [uid for uid in uids if uid in summaries]
+    return [summaries[uid] for uid in uids], [bodies.get(uid, {}) for uid in uids]
+
+
+def new_mail_items(mark_seen: bool) -> str:
+    return "RFC822" if mark_seen else "BODY.PEEK[]"
+
+
+def parse_email(raw_email: bytes, uid: bytes) -> dict:
+    msg = email.message_from_bytes(raw_email)
+    
+    return {
+        "uid": uid.decode(),
+        "subject": decode_header_value(msg["Subject"]) or "(без темы)",
+        "sender": decode_header_value(msg["From"]),
+        "date": msg["Date"],
+        "body": get_email_body(msg),
+        "attachments": get_attachments(msg)
+    }
+
+
+def summary_email(summary: dict, body: str) -> dict:
+    return {
+        "uid": summary["uid"],
+        "subject": summary["subject"],
+        "sender": summary["sender"],
+        "date": summary["date"],
+        "body": body,
+        "attachments": summary["attachments"]
+    }
+
+
+def build_preview(summary: dict, sections: dict) -> dict:
+    part = preview_part(summary["text_parts"])
+    data = sections.get(part["section"]) if part else None
+    if not data:
+        return summary_email(summary, "")
+    
+    truncated = part["size"] > len(data)
+    text = decode_text_part(data, part, partial=truncated)
+    if part["content_type"] == "text/html":
+        text = html_to_text(text)
+    
+    preview = summary_email(summary, text.strip())
+    preview["truncated"] = truncated
+    return preview
+
+
+def build_view(summary: dict, bodies: dict) -> dict:
+    text_body = ""
+    html_body = ""
+    for part in summary["text_parts"]:
+        data = bodies.get(part["section"])
+        if not data:
+            continue
+        if part["content_type"] == "text/plain":
+            text_body = decode_text_part(data, part)
+        else:
+            html_body = decode_text_part(data, part)
+    
+    if text_body:
+        return summary_email(summary, text_body.strip())
+    return summary_email(summary, html_to_text(html_body))
+
+
+class SectionDownload:
+    """Скачивание вложения по номеру MIME-секции кусками BODY.PEEK[секция]<offset.size>"""
+    
+    def __init__(self, section: str, chunk_size: int = None):
+        self.section = section
+        self.chunk_size = chunk_size or int(os.getenv("ATTACHMENT_FETCH_CHUNK", 1024 * 1024))
+        self.offset = 0
+        self.complete = False
+        self.handle: AttachmentHandle | None = None
+        self._decoder: TransferDecoder | None = None
+    
+    def query(self) -> str:
+        # BODYSTRUCTURE запрашивается вместе с первым куском, чтобы не тратить отдельный запрос
+        structure = "BODYSTRUCTURE " if self.handle is None else ""
+        return f"(UID {structure}BODY.PEEK[{self.section}]<{self.offset}.{self.chunk_size}>)"
+    
+    def _start(self, structure) -> bool:
+        if not isinstance(structure, list) or not structure:
+            return False
+        part = next((p for p in attachment_parts(structure) if p["section"] == self.section), None)
+        if part is None or encoded_size(part["size"], part["encoding"]) > MAX_ATTACHMENT_SIZE:
+            return False
+        self.handle = AttachmentHandle(decode_header_value(part["filename"]), part["content_type"])
+        self._decoder = TransferDecoder(part["encoding"])
+        return True
+    
+    def feed(self, msg_data: list) -> bool:
+        """Принимает ответ на query(); False — скачивание закончено или невозможно"""
+        items = next((i for i in parse_fetch_response(msg_data) if "UID" in i), {})
+        if self.handle is None and not self._start(items.get("BODYSTRUCTURE")):
+            return False
+        
+        chunk = next(
+            (value for name, value in items.items() if name.startswith(f"BODY[{self.section}]")),
+            None
+        ) or b""
+        self.handle.write(self._decoder.feed(chunk))
+        self.offset += len(chunk)
+        if self.handle.size > MAX_ATTACHMENT_SIZE:
+            return False
+        if len(chunk) < self.chunk_size:
+            self.handle.write(self._decoder.flush())
+            self.complete = True
+            return False
+        return True
+    
+    def result(self) -> dict | None:
+        if not self.complete:
+            self.close()
+            return None
+        return {"filename": self.handle.filename, "handle": self.handle, "size": self.handle.size}
+    
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+
+
 class MailService:
     
     def __init__(self):
         self.email_addr = os.getenv("YANDEX_EMAIL")
         self.password = os.getenv("YANDEX_APP_PASSWORD")
         self.server = "imap.yandex.ru"
-        self.seen_uids = set()
+        self.pool = self._create_pool()
+        self.sync = IncrementalSync(f"{self.email_addr}/{self.pool.mailbox}")
+        # STATUS → поиск → FETCH → commit выполняются по одному: иначе два опроса
+        # прочитают один last_uid и доставят одно письмо дважды
+        self._check_lock = threading.Lock()
+        self.cache = MessageCache()
+        self.parser = ParserPool()
+        self.idle_listener = None
     
-    def _connect(self):
-        mail = imaplib.IMAP4_SSL(self.server, 993)
-        mail.login(self.email_addr, self.password)
-        mail.select("INBOX")
-        return mail
+    def _create_pool(self):
+        return IMAPConnectionPool(self.server, self.email_addr, self.password)
     
-    def _parse_email(self, raw_email: bytes, uid: bytes) -> dict:
-        msg = email.message_from_bytes(raw_email)
-        
-        return {
-            "uid": uid.decode(),
-            "subject": decode_header_value(msg["Subject"]) or "(без темы)",
-            "sender": decode_header_value(msg["From"]),
-            "date": msg["Date"],
-            "body": get_email_body(msg),
-            "attachments": get_attachments(msg)
-        }
+    def start_idle(self, on_new_mail):
+        """Запускает IDLE-слушатель, on_new_mail вызывается из его потока"""
+        if self.idle_listener is None:
+            self.idle_listener = IMAPIdleListener(self.pool, on_new_mail)
+            self.idle_listener.start()
+    
+    def close(self):
+        if self.idle_listener is not None:
+            self.idle_listener.stop()
+            self.idle_listener = None
+        self.pool.close()
+        self.parser.close()
     
-    def check_new_emails(self, limit: int = 5, mark_seen: bool = True) -> list:
-        new_emails = []
+    def _run(self, error: str, default, func, *args):
+        """pool.run с выводом ошибки вместо исключения.
         
+        У AsyncMailService pool.run — корутина, и _run тоже, поэтому публичные
+        методы ниже общие: в async-сервисе они возвращают то, что нужно await-ить.
+        """
         try:
-            mail = self._connect()
-            
-            status, messages = mail.search(None, "UNSEEN")
-            if status == "OK":
-                uids = messages[0].split()
-                
-                for uid in uids[-limit:]:
-                    if uid in self.seen_uids:
-                        continue
-                    self.seen_uids.add(uid)
-                    
-                    fetch_cmd = "(RFC822)" if mark_seen else "(BODY.PEEK[])"
-                    status, msg_data = mail.fetch(uid, fetch_cmd)
-                    if status != "OK":
-                        continue
-                    
-                    raw_email = msg_data[0][1]
-                    new_emails.append(self._parse_email(raw_email, uid))
-            
-            mail.logout()
+            return self.pool.run(func, *args)
         except Exception as e:
-            print(f"Ошибка проверки почты: {e}")
+            print(f"{error}: {e}")
+            return default
+    
+    def _parse_emails(self, raw_emails: dict, uids: list) -> list:
+        """Разбирает скачанные письма в пуле воркеров, сохраняя порядок uids"""
+        return self.parser.map(parse_email, *parse_jobs(raw_emails, uids))
+    
+    def _mailbox_status(self, status: str, data: list) -> dict | None:
+        """Разбирает ответ STATUS; UIDVALIDITY из него свежее запомненного при SELECT"""
+        values = status_values(status, data)
+        if values and values.get("UIDVALIDITY"):
+            # Ящик пересоздан — ключи кэша писем и file_id сменятся вместе с ним
+            self.pool.uidvalidity = values["UIDVALIDITY"]
+        return values
+    
+    def _cache_key(self, uid: bytes) -> str | None:
+        if self.pool.uidvalidity is None:
+            return None
+        return MessageCache.key(self.email_addr, self.pool.mailbox, self.pool.uidvalidity, uid.decode())
+    
+    def attachment_key(self, uid: str, section: str) -> str | None:
+        """Ключ вложения в кэше file_id; известен без скачивания, пока UIDVALIDITY тот же"""
+        if self.pool.uidvalidity is None:
+            return None
+        return FileIdCache.section_key(self.email_addr, self.pool.mailbox, self.pool.uidvalidity, uid, section)
+    
+    def _cached_raw(self, uids: list) -> tuple[dict, list]:
+        """Делит UID на найденные в кэше {uid: raw} и те, что надо скачать"""
+        raw_emails, missing = {}, []
+        for uid in uids:
+            key = self._cache_key(uid)
+            raw = self.cache.get_raw(key) if key else None
+            if raw is None:
+                missing.append(uid)
+            else:
+                raw_emails[uid] = raw
+        return raw_emails, missing
+    
+    def _cache_raw(self, raw_emails: dict) -> dict:
+        for uid, raw in raw_emails.items():
+            key = self._cache_key(uid)
+            if key:
+                self.cache.put_raw(key, raw)
+        return raw_emails
+    
+    def _cached_summaries(self, uids: list) -> tuple[dict, list]:
+        summaries, missing = {}, []
+        for uid in uids:
+            key = self._cache_key(uid)
+            summary = self.cache.get_meta(key) if key else None
+            # В записях кэша старого формата нет text_parts — они скачиваются заново
+            if summary is None or "text_parts" not in summary:
+                missing.append(uid)
+            else:
+                summaries[uid] = summary
+        return summaries, missing
+    
+    def _cache_summaries(self, summaries: list) -> dict:
+        by_uid = {}
+        for summary in summaries:
+            uid = summary["uid"].encode()
+            key = self._cache_key(uid)
+            if key:
+                self.cache.put_meta(key, summary)
+            by_uid[uid] = summary
+        return by_uid
+    
+    def _parse_summary(self, items: dict) -> dict:
+        envelope = parse_envelope(items["ENVELOPE"])
         
-        return new_emails
+        return {
+            "uid": items["UID"].decode(),
+            "subject": decode_header_value(envelope["subject"]) or "(без темы)",
+            "sender": decode_header_value(envelope["from"]),
+            "date": envelope["date"],
+            "size": int(items.get("RFC822.SIZE") or 0),
+            "text_parts": text_parts(items["BODYSTRUCTURE"]),
+            "attachments": [
+                {
+                    "filename": decode_header_value(part["filename"]),
+                    "size": encoded_size(part["size"], part["encoding"]),
+                    "section": part["section"],
+                }
+                for part in attachment_parts(items["BODYSTRUCTURE"])
+            ]
+        }
     
-    def get_emails_by_date(self, days_back: int = 7, offset: int = 0, limit: int = 1) -> tuple:
-        emails = []
-        total = 0
+    def _parse_summaries(self, msg_data: list) -> list:
+        return [
+            self._parse_summary(items)
+            for items in parse_fetch_response(msg_data) if "UID" in items
+        ]
+    
+    def _fetched_summaries(self, status: str, msg_data: list) -> dict:
+        """Сводки из ответа FETCH SUMMARY_ITEMS, заодно кладёт их в кэш"""
+        if status != "OK":
+            return {}
+        return self._cache_summaries(self._parse_summaries(msg_data))
+    
+    # Ввод-вывод: у AsyncMailService те же методы с await
+    
+    def _raw_emails(self, mail, uids: list, items: str = "BODY.PEEK[]") -> dict:
+        """Письма целиком {uid: raw}: из кэша, недостающие — одним UID FETCH"""
+        raw_emails, missing = self._cached_raw(uids)
+        raw_emails.update(self._cache_raw(fetch_messages(mail, missing, items)))
+        return raw_emails
+    
+    def _summaries(self, mail, uids: list) -> dict:
+        """Сводки писем {uid: summary}: из кэша, недостающие — одним UID FETCH"""
+        summaries, missing = self._cached_summaries(uids)
+        if missing:
+            summaries.update(self._fetched_summaries(*mail.uid("FETCH", uid_set(missing), SUMMARY_ITEMS)))
+        return summaries
+    
+    def _fetch_previews(self, mail, uids: list, mark_seen: bool = False) -> list:
+        """Письма для уведомлений: из тела скачивается только префикс лучшей текстовой части"""
+        summaries = self._summaries(mail, uids)
         
-        try:
-            mail = self._connect()
-            
-            since_date = (datetime.now() - timedelta(days=days_back)).strftime("%d-%b-%Y")
-            status, messages = mail.search(None, f'(SINCE "{since_date}")')
-            
+        bodies = {}
+        for items, group in preview_queries(summaries, mark_seen).items():
+            status, msg_data = mail.uid("FETCH", uid_set(group), items)
             if status == "OK":
-                uids = messages[0].split()
-                total = len(uids)
-                
-                uids = list(reversed(uids))
-                
-                for uid in uids[offset:offset + limit]:
-                    status, msg_data = mail.fetch(uid, "(BODY.PEEK[])")
-                    if status != "OK":
-                        continue
-                    
-                    raw_email = msg_data[0][1]
-                    emails.append(self._parse_email(raw_email, uid))
-            
-            mail.logout()
-        except Exception as e:
-            print(f"Ошибка получения писем: {e}")
+                bodies.update(preview_bodies(msg_data))
+        
+        unread = unread_uids(summaries, bodies) if mark_seen else []
+        if unread:
+            mail.uid("STORE", uid_set(unread), "+FLAGS.SILENT", "(\\Seen)")
         
-        return emails, total
+        return self.parser.map(build_preview, *preview_jobs(uids, summaries, bodies))
     
-    def get_all_emails(self, limit: int = 5) -> list:
-        emails = []
+    def _check_new_emails(self, mail, limit: int, mark_seen: bool, preview: bool) -> list:
+        mailbox_status = self._mailbox_status(*mail.status(self.pool.mailbox, MAILBOX_STATE_ITEMS))
+        if mailbox_status is None:
+            return []
         
-        try:
-            mail = self._connect()
-            
-            status, messages = mail.search(None, "ALL")
-            if status == "OK":
-                uids = messages[0].split()
-                
-                for uid in uids[-limit:]:
-                    status, msg_data = mail.fetch(uid, "(BODY.PEEK[])")
-                    if status != "OK":
-                        continue
-                    
-                    raw_email = msg_data[0][1]
-                    emails.append(self._parse_email(raw_email, uid))
-            
-            mail.logout()
-        except Exception as e:
-            print(f"Ошибка получения писем: {e}")
+        criteria = self.sync.search_criteria(mailbox_status)
+        uids = search_uids(*mail.uid("SEARCH", None, criteria)) if criteria else []
+        new_uids, last_uid = self.sync.select_new(mailbox_status, uids, limit)
         
-        return emails
-
-    def get_emails_page(self, page: int = 0, per_page: int = 10) -> tuple[list, int, int]:
-        emails = []
-        total = 0
+        if preview:
+            new_emails = self._fetch_previews(mail, new_uids, mark_seen)
+        else:
+            raw_emails = self._cache_raw(fetch_messages(mail, new_uids, new_mail_items(mark_seen)))
+            new_emails = self._parse_emails(raw_emails, new_uids)
         
-        try:
-            mail = self._connect()
-            
-            status, messages = mail.search(None, "ALL")
+        self.sync.commit(mailbox_status, last_uid)
+        return new_emails
+    
+    def _get_emails_by_date(self, mail, days_back: int, offset: int, limit: int) -> tuple:
+        page_uids, total = newest_slice(search_uids(*mail.uid("SEARCH", None, since_criteria(days_back))), offset, limit)
+        return self._parse_emails(self._raw_emails(mail, page_uids), page_uids), total
+    
+    def _get_all_emails(self, mail, limit: int, preview: bool) -> list:
+        uids = search_uids(*mail.uid("SEARCH", None, "ALL"))[-limit:]
+        if preview:
+            return self._fetch_previews(mail, uids)
+        return self._parse_emails(self._raw_emails(mail, uids), uids)
+    
+    def _mailbox_state(self, mail) -> tuple | None:
+        return mailbox_state_key(self._mailbox_status(*mail.status(self.pool.mailbox, MAILBOX_STATE_ITEMS)))
+    
+    def _page_uids(self, mail, page: int, per_page: int) -> tuple[list, int]:
+        return newest_slice(search_uids(*mail.uid("SEARCH", None, "ALL")), page * per_page, per_page)
+    
+    def _get_emails_page(self, mail, page: int, per_page: int) -> tuple[list, int, int]:
+        page_uids, total = self._page_uids(mail, page, per_page)
+        return with_pages(self._parse_emails(self._raw_emails(mail, page_uids), page_uids), total, per_page)
+    
+    def _get_email_summaries_page(self, mail, page: int, per_page: int) -> tuple[list, int, int]:
+        page_uids, total = self._page_uids(mail, page, per_page)
+        summaries = self._summaries(mail, page_uids) if page_uids else {}
+        return with_pages([summaries[uid] for uid in page_uids if uid in summaries], total, per_page)
+    
+    def _get_email_by_uid(self, mail, uid: str) -> dict | None:
+        uids = [uid.encode()]
+        emails = self._parse_emails(self._raw_emails(mail, uids), uids)
+        return emails[0] if emails else None
+    
+    def _get_email_view(self, mail, uid: str) -> dict | None:
+        summary = self._summaries(mail, [uid.encode()]).get(uid.encode())
+        if summary is None:
+            return None
+        
+        bodies = {}
+        if summary["text_parts"]:
+            status, msg_data = mail.uid("FETCH", uid, section_items(summary["text_parts"]))
             if status == "OK":
-                uids = messages[0].split()
-                total = len(uids)
-
-                uids = list(reversed(uids))
-
-                start = page * per_page
-                end = start + per_page
-                page_uids = uids[start:end]
-                
-                for uid in page_uids:
-                    status, msg_data = mail.fetch(uid, "(BODY.PEEK[])")
-                    if status != "OK":
-                        continue
-                    
-                    raw_email = msg_data[0][1]
-                    emails.append(self._parse_email(raw_email, uid))
-            
-            mail.logout()
-        except Exception as e:
-            print(f"Ошибка получения писем: {e}")
+                bodies = section_bodies(msg_data)
         
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 0
-        return emails, total, total_pages
-
-    def get_email_by_uid(self, uid: str) -> dict | None:
+        return self.parser.map(build_view, [summary], [bodies])[0]
+    
+    def _get_attachment(self, mail, uid: str, section: str) -> dict | None:
+        download = SectionDownload(section)
         try:
-            mail = self._connect()
-            
-            status, msg_data = mail.fetch(uid.encode(), "(BODY.PEEK[])")
-            if status != "OK":
-                mail.logout()
-                return None
-            
-            raw_email = msg_data[0][1]
-            email_data = self._parse_email(raw_email, uid.encode())
-            
-            mail.logout()
-            return email_data
-        except Exception as e:
-            print(f"Ошибка получения письма {uid}: {e}")
-            return None
+            while True:
+                status, msg_data = mail.uid("FETCH", uid, download.query())
+                if status != "OK" or not download.feed(msg_data):
+                    break
+        except BaseException:
+            download.close()
+            raise
+        return download.result()
+    
+    # Публичные методы: общие для обоих сервисов, см. _run
+    
+    def check_new_emails(self, limit: int = 5, mark_seen: bool = True, preview: bool = False) -> list:
+        """preview=True — для уведомлений: только начало текста, вложения без скачивания"""
+        with self._check_lock:
+            return self._run("Ошибка проверки почты", [], self._check_new_emails, limit, mark_seen, preview)
+    
+    def get_emails_by_date(self, days_back: int = 7, offset: int = 0, limit: int = 1) -> tuple:
+        return self._run("Ошибка получения писем", ([], 0), self._get_emails_by_date, days_back, offset, limit)
+    
+    def get_all_emails(self, limit: int = 5, preview: bool = False) -> list:
+        return self._run("Ошибка получения писем", [], self._get_all_emails, limit, preview)
+    
+    def get_emails_page(self, page: int = 0, per_page: int = 10) -> tuple[list, int, int]:
+        return self._run("Ошибка получения писем", ([], 0, 0), self._get_emails_page, page, per_page)
+    
+    def mailbox_state(self) -> tuple | None:
+        """(UIDVALIDITY, UIDNEXT, MESSAGES) — меняется, только если в ящике что-то добавилось или удалилось"""
+        return self._run("Ошибка STATUS", None, self._mailbox_state)
+    
+    def get_email_summaries_page(self, page: int = 0, per_page: int = 10) -> tuple[list, int, int]:
+        """Страница писем без тел и вложений: только ENVELOPE, BODYSTRUCTURE и размер"""
+        return self._run("Ошибка получения писем", ([], 0, 0), self._get_email_summaries_page, page, per_page)
+    
+    def get_email_by_uid(self, uid: str) -> dict | None:
+        return self._run(f"Ошибка получения письма {uid}", None, self._get_email_by_uid, uid)
+    
+    def get_email_view(self, uid: str) -> dict | None:
+        """Письмо для просмотра: скачиваются только текстовые части, вложения — с номерами секций"""
+        return self._run(f"Ошибка получения письма {uid}", None, self._get_email_view, uid)
+    
+    def get_attachment(self, uid: str, section: str) -> dict | None:
+        """Скачивает одно вложение по номеру секции: {filename, handle, size}"""
+        return self._run(f"Ошибка получения вложения {uid}/{section}", None, self._get_attachment, uid, section)
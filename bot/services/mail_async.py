@@ -0,0 +1,181 @@
+import asyncio
+
+from .aio_imap import AsyncIMAPConnectionPool, AsyncIMAPIdleListener
+from .mail import (
+    MailService,
+    SectionDownload,
+    SUMMARY_ITEMS,
+    MAILBOX_STATE_ITEMS,
+    build_preview,
+    build_view,
+    mailbox_state_key,
+    messages_by_uid,
+    new_mail_items,
+    newest_slice,
+    parse_email,
+    parse_jobs,
+    preview_bodies,
+    preview_jobs,
+    preview_queries,
+    search_uids,
+    section_bodies,
+    section_items,
+    since_criteria,
+    uid_set,
+    unread_uids,
+    with_pages,
+)
+
+
+async def fetch_messages(mail, uids: list, items: str = "BODY.PEEK[]") -> dict:
+    """Асинхронный аналог mail.fetch_messages: один UID FETCH на набор UID"""
+    if not uids:
+        return {}
+
+    status, msg_data = await mail.uid("FETCH", uid_set(uids), f"(UID {items})")
+    return messages_by_uid(msg_data) if status == "OK" else {}
+
+
+class AsyncMailService(MailService):
+    """MailService поверх aioimaplib: те же методы, но не блокируют event loop.
+
+    Здесь только ввод-вывод: команды IMAP и разбор писем с await. Разбор ответов,
+    кэш и публичные методы наследуются от MailService.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # Создаётся лениво, чтобы привязаться к работающему event loop
+        self._check_lock: asyncio.Lock | None = None
+
+    def _create_pool(self):
+        return AsyncIMAPConnectionPool(self.server, self.email_addr, self.password)
+
+    def start_idle(self, on_new_mail):
+        """Запускает IDLE-слушатель в текущем event loop"""
+        if self.idle_listener is None:
+            self.idle_listener = AsyncIMAPIdleListener(self.pool, on_new_mail)
+            self.idle_listener.start()
+
+    async def close(self):
+        if self.idle_listener is not None:
+            self.idle_listener.stop()
+            self.idle_listener = None
+        await self.pool.close()
+        self.parser.close()
+
+    async def _run(self, error: str, default, func, *args):
+        try:
+            return await self.pool.run(func, *args)
+        except Exception as e:
+            print(f"{error}: {e}")
+            return default
+
+    async def _parse_emails(self, raw_emails: dict, uids: list) -> list:
+        return await self.parser.map_async(parse_email, *parse_jobs(raw_emails, uids))
+
+    async def _raw_emails(self, mail, uids: list, items: str = "BODY.PEEK[]") -> dict:
+        raw_emails, missing = self._cached_raw(uids)
+        raw_emails.update(self._cache_raw(await fetch_messages(mail, missing, items)))
+        return raw_emails
+
+    async def _summaries(self, mail, uids: list) -> dict:
+        summaries, missing = self._cached_summaries(uids)
+        if missing:
+            summaries.update(self._fetched_summaries(*await mail.uid("FETCH", uid_set(missing), SUMMARY_ITEMS)))
+        return summaries
+
+    async def _fetch_previews(self, mail, uids: list, mark_seen: bool = False) -> list:
+        summaries = await self._summaries(mail, uids)
+
+        bodies = {}
+        for items, group in preview_queries(summaries, mark_seen).items():
+            status, msg_data = await mail.uid("FETCH", uid_set(group), items)
+            if status == "OK":
+                bodies.update(preview_bodies(msg_data))
+
+        unread = unread_uids(summaries, bodies) if mark_seen else []
+        if unread:
+            await mail.uid("STORE", uid_set(unread), "+FLAGS.SILENT", "(\\Seen)")
+
+        return await self.parser.map_async(build_preview, *preview_jobs(uids, summaries, bodies))
+
+    async def check_new_emails(self, limit: int = 5, mark_seen: bool = True, preview: bool = False) -> list:
+        if self._check_lock is None:
+            self._check_lock = asyncio.Lock()
+        async with self._check_lock:
+            return await self._run("Ошибка проверки почты", [], self._check_new_emails, limit, mark_seen, preview)
+
+    async def _check_new_emails(self, mail, limit: int, mark_seen: bool, preview: bool) -> list:
+        mailbox_status = self._mailbox_status(*await mail.status(self.pool.mailbox, MAILBOX_STATE_ITEMS))
+        if mailbox_status is None:
+            return []
+
+        criteria = self.sync.search_criteria(mailbox_status)
+        uids = search_uids(*await mail.uid("SEARCH", None, criteria)) if criteria else []
+        new_uids, last_uid = self.sync.select_new(mailbox_status, uids, limit)
+
+        if preview:
+            new_emails = await self._fetch_previews(mail, new_uids, mark_seen)
+        else:
+            raw_emails = self._cache_raw(await fetch_messages(mail, new_uids, new_mail_items(mark_seen)))
+            new_emails = await self._parse_emails(raw_emails, new_uids)
+
+        self.sync.commit(mailbox_status, last_uid)
+        return new_emails
+
+    async def _get_emails_by_date(self, mail, days_back: int, offset: int, limit: int) -> tuple:
+        page_uids, total = newest_slice(search_uids(*await mail.uid("SEARCH", None, since_criteria(days_back))), offset, limit)
+        return await self._parse_emails(await self._raw_emails(mail, page_uids), page_uids), total
+
+    async def _get_all_emails(self, mail, limit: int, preview: bool) -> list:
+        uids = search_uids(*await mail.uid("SEARCH", None, "ALL"))[-limit:]
+        if preview:
+            return await self._fetch_previews(mail, uids)
+        return await self._parse_emails(await self._raw_emails(mail, uids), uids)
+
+    async def _mailbox_state(self, mail) -> tuple | None:
+        return mailbox_state_key(self._mailbox_status(*await mail.status(self.pool.mailbox, MAILBOX_STATE_ITEMS)))
+
+    async def _page_uids(self, mail, page: int, per_page: int) -> tuple[list, int]:
+        return newest_slice(search_uids(*await mail.uid("SEARCH", None, "ALL")), page * per_page, per_page)
+
+    async def _get_emails_page(self, mail, page: int, per_page: int) -> tuple[list, int, int]:
+        page_uids, total = await self._page_uids(mail, page, per_page)
+        emails = await self._parse_emails(await self._raw_emails(mail, page_uids), page_uids)
+        return with_pages(emails, total, per_page)
+
+    async def _get_email_summaries_page(self, mail, page: int, per_page: int) -> tuple[list, int, int]:
+        page_uids, total = await self._page_uids(mail, page, per_page)
+        summaries = await self._summaries(mail, page_uids) if page_uids else {}
+        return with_pages([summaries[uid] for uid in page_uids if uid in summaries], total, per_page)
+
+    async def _get_email_by_uid(self, mail, uid: str) -> dict | None:
+        uids = [uid.encode()]
+        emails = await self._parse_emails(await self._raw_emails(mail, uids), uids)
+        return emails[0] if emails else None
+
+    async def _get_email_view(self, mail, uid: str) -> dict | None:
+        summary = (await self._summaries(mail, [uid.encode()])).get(uid.encode())
+        if summary is None:
+            return None
+
+        bodies = {}
+        if summary["text_parts"]:
+            status, msg_data = await mail.uid("FETCH", uid, section_items(summary["text_parts"]))
+            if status == "OK":
+                bodies = section_bodies(msg_data)
+
+        return (await self.parser.map_async(build_view, [summary], [bodies]))[0]
+
+    async def _get_attachment(self, mail, uid: str, section: str) -> dict | None:
+        download = SectionDownload(section)
+        try:
+            while True:
+                status, msg_data = await mail.uid("FETCH", uid, download.query())
+                if status != "OK" or not download.feed(msg_data):
+                    break
+        except BaseException:
+            download.close()
+            raise
+        return download.result()
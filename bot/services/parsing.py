@@ -0,0 +1,44 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class ParserPool:
+    """Пул для CPU-тяжёлого разбора писем (MIME, html2text) вне event loop.
+
+    MAIL_PARSE_EXECUTOR=thread|process, MAIL_PARSE_WORKERS — число воркеров.
+    В режиме process функция и её аргументы должны сериализоваться pickle.
+    """
+
+    def __init__(self, workers: int = None, kind: str = None):
+        self.workers = workers or int(os.getenv("MAIL_PARSE_WORKERS", os.cpu_count() or 1))
+        self.kind = (kind or os.getenv("MAIL_PARSE_EXECUTOR", "thread")).lower()
+        if self.kind not in ("thread", "process"):
+            raise ValueError(f"Неизвестный тип пула разбора: {self.kind}")
+        self._executor: Executor | None = None
+
+    @property
+    def executor(self) -> Executor:
+        # Воркеры поднимаются при первом письме, а не при импорте
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="mail-parse")
+        return self._executor
+
+    def map(self, func, *iterables) -> list:
+        """func по всем элементам параллельно, результаты в исходном порядке"""
+        return list(self.executor.map(func, *iterables))
+
+    async def map_async(self, func, *iterables) -> list:
+        loop = asyncio.get_running_loop()
+        return list(await asyncio.gather(*(
+            loop.run_in_executor(self.executor, func, *args)
+            for args in zip(*iterables)
+        )))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,213 @@
+import asyncio
+import itertools
+import os
+import time
+from dataclasses import dataclass, field
+
+# Приоритеты отправки: ответы пользователю обгоняют массовые уведомления
+INTERACTIVE = 0
+BULK = 1
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity про запас"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float, cost: float = 1) -> float:
+        """Через сколько секунд появятся cost токенов (0 — уже есть)"""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        # Запрос дороже ведра ждёт полного ведра и уводит его в минус —
+        # следующие запросы чата отрабатывают этот долг
+        need = min(cost, self.capacity)
+        if self.tokens >= need:
+            return 0.0
+        return (need - self.tokens) / self.rate
+
+    def take(self, cost: float = 1):
+        self.tokens -= cost
+
+    def block(self, until: float):
+        self.blocked_until = max(self.blocked_until, until)
+        self.tokens = 0
+
+    def idle(self, now: float) -> bool:
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    chat_id: str | None = field(compare=False)
+    enqueued: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    cost: float = field(compare=False, default=1)
+
+
+class SendScheduler:
+    """Очередь исходящих запросов к Telegram с учётом лимитов.
+
+    Глобальное ведро (~30 сообщений/с) и ведро на каждый чат (~1/с, группы ~20/мин).
+    Запросы одного чата выдаются по порядку внутри приоритета, INTERACTIVE раньше BULK;
+    занятый чат не задерживает остальные. 429 с retry_after блокирует ведро чата.
+    Альбом из n файлов Telegram считает за n сообщений — такой запрос стоит n токенов.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = None,
+        chat_rate: float = None,
+        chat_burst: float = None,
+        group_rate: float = None,
+    ):
+        self.global_rate = global_rate or float(os.getenv("TELEGRAM_GLOBAL_RATE", 30))
+        self.chat_rate = chat_rate or float(os.getenv("TELEGRAM_CHAT_RATE", 1))
+        self.chat_burst = chat_burst or float(os.getenv("TELEGRAM_CHAT_BURST", 3))
+        self.group_rate = group_rate or float(os.getenv("TELEGRAM_GROUP_RATE", 20 / 60))
+
+        self._global = TokenBucket(self.global_rate, self.global_rate)
+        self._chats: dict[str, TokenBucket] = {}
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+        self._granted = {INTERACTIVE: 0, BULK: 0}
+        self._wait_total = {INTERACTIVE: 0.0, BULK: 0.0}
+        self._wait_max = {INTERACTIVE: 0.0, BULK: 0.0}
+        self._max_depth = 0
+        self.throttled = 0
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Отрицательные id — группы и каналы, у них лимит строже
+            rate = self.group_rate if chat_id.startswith("-") else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, self.chat_burst)
+        return bucket
+
+    def _ensure_dispatcher(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        # Новый event loop (например, следующий serverless-вызов): ожидания старого loop уже не нужны
+        if self._loop is not loop:
+            self._waiters = []
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._dispatch())
+
+    async def acquire(self, chat_id: str | int | None, priority: int = INTERACTIVE, cost: float = 1) -> float:
+        """Ждёт разрешения на запрос в чат; chat_id=None — только глобальный лимит. Возвращает ожидание в секундах"""
+        self._ensure_dispatcher()
+        waiter = _Waiter(
+            priority,
+            next(self._seq),
+            str(chat_id) if chat_id is not None else None,
+            time.monotonic(),
+            self._loop.create_future(),
+            cost,
+        )
+        self._waiters.append(waiter)
+        self._max_depth = max(self._max_depth, len(self._waiters))
+        self._wakeup.set()
+        return await waiter.future
+
+    def throttle(self, chat_id: str | int | None, retry_after: float):
+        """Ответ 429: запросы в чат (или все, если chat_id=None) ждут retry_after секунд"""
+        self.throttled += 1
+        until = time.monotonic() + retry_after
+        if chat_id is None:
+            self._global.block(until)
+        else:
+            self._chat_bucket(str(chat_id)).block(until)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _grant_ready(self) -> float | None:
+        """Выдаёт разрешения всем, кому можно; возвращает время до следующей проверки"""
+        now = time.monotonic()
+        self._waiters = [w for w in self._waiters if not w.future.done()]
+        self._waiters.sort()
+
+        next_check = None
+        blocked_chats = set()
+        for waiter in list(self._waiters):
+            # За ожидающим запросом чата остальные его запросы не проходят — порядок сохраняется
+            if waiter.chat_id in blocked_chats:
+                continue
+
+            chat_bucket = self._chat_bucket(waiter.chat_id) if waiter.chat_id is not None else None
+            delay = max(
+                self._global.delay(now, waiter.cost),
+                chat_bucket.delay(now, waiter.cost) if chat_bucket else 0.0,
+            )
+            if delay > 0:
+                if waiter.chat_id is not None:
+                    blocked_chats.add(waiter.chat_id)
+                next_check = delay if next_check is None else min(next_check, delay)
+                continue
+
+            self._global.take(waiter.cost)
+            if chat_bucket:
+                chat_bucket.take(waiter.cost)
+            self._waiters.remove(waiter)
+
+            waited = now - waiter.enqueued
+            self._granted[waiter.priority] += 1
+            self._wait_total[waiter.priority] += waited
+            self._wait_max[waiter.priority] = max(self._wait_max[waiter.priority], waited)
+            waiter.future.set_result(waited)
+
+        if len(self._chats) > 1000:
+            self._chats = {chat: bucket for chat, bucket in self._chats.items() if not bucket.idle(now)}
+        return next_check
+
+    async def _dispatch(self):
+        while True:
+            next_check = self._grant_ready()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), next_check)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        """Глубина очереди и время ожидания по приоритетам"""
+        queued = [w for w in self._waiters if not w.future.done()]
+        result = {"queued": len(queued), "max_queued": self._max_depth, "throttled": self.throttled}
+        for priority, name in ((INTERACTIVE, "interactive"), (BULK, "bulk")):
+            granted = self._granted[priority]
+            result[name] = {
+                "queued": sum(1 for w in queued if w.priority == priority),
+                "sent": granted,
+                "wait_avg_ms": round(self._wait_total[priority] / granted * 1000, 1) if granted else 0.0,
+                "wait_max_ms": round(self._wait_max[priority] * 1000, 1),
+            }
+        return result
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for waiter in self._waiters:
+            waiter.future.cancel()
+        self._waiters = []
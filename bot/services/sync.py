@@ -0,0 +1,93 @@
+import json
+import os
+import re
+
+from .cache import writable_path
+
+STATUS_RE = re.compile(rb"(MESSAGES|UIDVALIDITY|UIDNEXT) (\d+)")
+
+
+def parse_status(data: list) -> dict:
+    """Разбирает ответ STATUS в {ИМЯ: число}"""
+    values = {}
+    for line in data:
+        if isinstance(line, bytes):
+            for name, value in STATUS_RE.findall(line):
+                values[name.decode()] = int(value)
+    return values
+
+
+class MailboxSyncState:
+    """Состояние инкрементальной синхронизации по ящикам с сохранением в JSON"""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("MAIL_STATE_FILE") or writable_path(".mail_state.json")
+        self._state = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._state, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Не удалось сохранить состояние почты: {e}")
+
+    def get(self, key: str) -> dict | None:
+        return self._state.get(key)
+
+    def set(self, key: str, **values):
+        self._state[key] = values
+        self._save()
+
+
+class IncrementalSync:
+    """Новые письма по UIDVALIDITY/UIDNEXT.
+
+    Каждый опрос — это STATUS и, только если появились письма, поиск
+    UID n+1:*. Стоимость не зависит от размера ящика.
+    """
+
+    def __init__(self, key: str, state: MailboxSyncState = None):
+        self.key = key
+        self.state = state or MailboxSyncState()
+
+    def search_criteria(self, status: dict) -> str | None:
+        saved = self.state.get(self.key)
+        if saved is None or saved["uidvalidity"] != status.get("UIDVALIDITY"):
+            # Первый запуск или ящик пересоздан: как раньше — непрочитанные
+            return "UNSEEN"
+        if status.get("UIDNEXT", 0) - 1 > saved["last_uid"]:
+            return f"UID {saved['last_uid'] + 1}:*"
+        return None
+
+    def select_new(self, status: dict, uids: list, limit: int) -> tuple[list, int]:
+        """Отбирает до limit самых старых новых UID, остальные достанутся следующему опросу"""
+        saved = self.state.get(self.key)
+        uidnext_last = status.get("UIDNEXT", 1) - 1
+
+        if saved is None or saved["uidvalidity"] != status.get("UIDVALIDITY"):
+            to_fetch = sorted(uids, key=int)[-limit:]
+            return to_fetch, max([uidnext_last, *(int(uid) for uid in to_fetch)])
+
+        # UID n+1:* всегда включает последнее письмо, даже если оно старое
+        candidates = sorted((uid for uid in uids if int(uid) > saved["last_uid"]), key=int)
+        to_fetch = candidates[:limit]
+        if len(candidates) > limit:
+            return to_fetch, int(to_fetch[-1])
+        # Письмо могло прийти между STATUS и SEARCH: его UID больше, чем UIDNEXT из STATUS
+        return to_fetch, max([uidnext_last, saved["last_uid"], *(int(uid) for uid in to_fetch)])
+
+    def commit(self, status: dict, last_uid: int):
+        self.state.set(
+            self.key,
+            uidvalidity=status.get("UIDVALIDITY"),
+            last_uid=last_uid,
+        )
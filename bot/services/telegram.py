@@ -1,18 +1,107 @@
+import asyncio
+import importlib.util
+import json
 import os
+from typing import BinaryIO
+
 import httpx
 
+from .file_ids import FileIdCache
+from .scheduler import INTERACTIVE, SendScheduler
+
+# HTTP/2 нужен пакет h2 (httpx[http2]); без него остаётся keep-alive HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# sendMediaGroup принимает от 2 до 10 элементов
+MEDIA_GROUP_SIZE = 10
+
+
+def attachment_groups(attachments: list, max_bytes: int) -> list[list]:
+    """Делит вложения на группы до MEDIA_GROUP_SIZE штук и max_bytes суммарно"""
+    groups = []
+    group, group_size = [], 0
+    for att in attachments:
+        if group and (len(group) == MEDIA_GROUP_SIZE or group_size + att["size"] > max_bytes):
+            groups.append(group)
+            group, group_size = [], 0
+        group.append(att)
+        group_size += att["size"]
+    if group:
+        groups.append(group)
+    return groups
+
+
+def document_file_id(message: dict) -> str | None:
+    document = (message or {}).get("document")
+    return document.get("file_id") if document else None
+
 
 class TelegramService:
     def __init__(self, token: str = None):
         self.token = token or os.getenv("TELEGRAM_BOT_TOKEN")
         self.api_url = f"https://api.telegram.org/bot{self.token}"
+        self._client: httpx.AsyncClient | None = None
+        self._client_loop: asyncio.AbstractEventLoop | None = None
+        self.scheduler = SendScheduler()
+        self.max_retries = int(os.getenv("TELEGRAM_MAX_RETRIES", 3))
+        self.upload_concurrency = int(os.getenv("TELEGRAM_UPLOAD_CONCURRENCY", 3))
+        self.group_max_bytes = int(os.getenv("TELEGRAM_GROUP_MAX_BYTES", 50 * 1024 * 1024))
+        self.file_ids = FileIdCache()
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Общий клиент с пулом соединений: DNS, TCP и TLS не повторяются на каждый запрос"""
+        loop = asyncio.get_running_loop()
+        # Соединения привязаны к event loop — в новом loop (serverless) клиент создаётся заново
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(float(os.getenv("TELEGRAM_TIMEOUT", 30)), connect=10),
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("TELEGRAM_MAX_CONNECTIONS", 20)),
+                    max_keepalive_connections=int(os.getenv("TELEGRAM_MAX_KEEPALIVE", 10)),
+                    keepalive_expiry=float(os.getenv("TELEGRAM_KEEPALIVE_EXPIRY", 60)),
+                ),
+            )
+            self._client_loop = loop
+        return self._client
+    
+    async def _request(self, method: str, chat_id: str | int | None, priority: int, cost: int = 1, **kwargs) -> dict:
+        """POST к Bot API через планировщик; на 429 ждёт retry_after и повторяет.
+        
+        cost — сколько сообщений запрос добавит в чат (для лимитов планировщика)
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.scheduler.acquire(chat_id, priority, cost)
+            # Файлы при повторе перечитываются с начала
+            for file_info in (kwargs.get("files") or {}).values():
+                if hasattr(file_info[1], "seek"):
+                    file_info[1].seek(0)
+            
+            resp = await self.client.post(f"{self.api_url}/{method}", **kwargs)
+            result = resp.json()
+            if resp.status_code != 429 or attempt == self.max_retries:
+                return result
+            
+            retry_after = result.get("parameters", {}).get("retry_after", 1)
+            print(f"Telegram {method}: 429, повтор через {retry_after} с")
+            self.scheduler.throttle(chat_id, retry_after)
+    
+    async def close(self):
+        await self.scheduler.close()
+        self.file_ids.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._client_loop = None
     
     async def send_message(
         self, 
         chat_id: str | int, 
         text: str, 
         reply_markup: dict = None,
-        parse_mode: str = "HTML"
+        parse_mode: str = "HTML",
+        priority: int = INTERACTIVE
     ) -> dict:
         max_length = 4000
         if len(text) > max_length:
@@ -27,57 +116,180 @@ class TelegramService:
         if reply_markup:
             data["reply_markup"] = reply_markup
         
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(f"{self.api_url}/sendMessage", json=data)
-            return resp.json()
+        return await self._request("sendMessage", chat_id, priority, json=data)
+    
+    async def edit_message(
+        self,
+        chat_id: str | int,
+        message_id: int,
+        text: str,
+        reply_markup: dict = None,
+        parse_mode: str = "HTML",
+        priority: int = INTERACTIVE
+    ) -> dict:
+        """Заменяет текст и кнопки уже отправленного сообщения вместо отправки нового"""
+        data = {
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "text": text,
+            "parse_mode": parse_mode
+        }
+        
+        if reply_markup:
+            data["reply_markup"] = reply_markup
+        
+        result = await self._request("editMessageText", chat_id, priority, json=data)
+        # Тот же текст и кнопки — Telegram отвечает ошибкой, но сообщение уже такое, как нужно
+        if not result.get("ok") and "message is not modified" in result.get("description", ""):
+            return {"ok": True, "result": None}
+        return result
     
     async def answer_callback(self, callback_id: str, text: str = "") -> dict:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                f"{self.api_url}/answerCallbackQuery",
-                json={
-                    "callback_query_id": callback_id,
-                    "text": text
-                }
-            )
-            return resp.json()
+        # Ответ на callback не сообщение в чат — действует только глобальный лимит
+        return await self._request(
+            "answerCallbackQuery",
+            None,
+            INTERACTIVE,
+            json={
+                "callback_query_id": callback_id,
+                "text": text
+            }
+        )
+    
+    async def get_updates(self, offset: int = None, timeout: int = 0, limit: int = 100) -> list:
+        """Long polling: ждёт новые апдейты до timeout секунд; offset подтверждает все апдейты до него"""
+        data = {"timeout": timeout, "limit": limit, "allowed_updates": ["message", "callback_query"]}
+        if offset is not None:
+            data["offset"] = offset
+        
+        # Входящие апдейты не расходуют лимиты отправки — мимо планировщика
+        resp = await self.client.post(f"{self.api_url}/getUpdates", json=data, timeout=timeout + 10)
+        result = resp.json()
+        if not result.get("ok"):
+            raise RuntimeError(f"getUpdates: {result.get('description', resp.status_code)}")
+        return result["result"]
     
     async def send_document(
         self, 
         chat_id: str | int, 
-        file_data: bytes, 
+        file_data: bytes | BinaryIO | str, 
         filename: str, 
-        caption: str = None
+        caption: str = None,
+        priority: int = INTERACTIVE
     ) -> dict:
-        """Отправляет документ"""
-        files = {"document": (filename, file_data, "application/octet-stream")}
+        """Отправляет документ; файловый объект читается потоком, строка — это file_id без загрузки"""
         data = {"chat_id": chat_id}
         if caption:
             data["caption"] = caption
         
         try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(
-                    f"{self.api_url}/sendDocument",
-                    data=data,
-                    files=files
-                )
-                return resp.json()
+            if isinstance(file_data, str):
+                data["document"] = file_data
+                return await self._request("sendDocument", chat_id, priority, json=data)
+            files = {"document": (filename, file_data, "application/octet-stream")}
+            return await self._request("sendDocument", chat_id, priority, data=data, files=files)
         except Exception as e:
             print(f"Telegram sendDocument error: {e}")
             return None
     
+    async def send_media_group(
+        self,
+        chat_id: str | int,
+        documents: list[tuple[str, bytes | BinaryIO | str, str | None]],
+        priority: int = INTERACTIVE
+    ) -> dict:
+        """Отправляет до 10 документов одним сообщением-альбомом: [(filename, file_data | file_id, caption)]"""
+        media = []
+        files = {}
+        for i, (filename, file_data, caption) in enumerate(documents):
+            if isinstance(file_data, str):
+                item = {"type": "document", "media": file_data}
+            else:
+                name = f"document{i}"
+                files[name] = (filename, file_data, "application/octet-stream")
+                item = {"type": "document", "media": f"attach://{name}"}
+            if caption:
+                item["caption"] = caption
+            media.append(item)
+        
+        data = {"chat_id": chat_id, "media": json.dumps(media, ensure_ascii=False)}
+        try:
+            # Каждый документ альбома — отдельное сообщение для лимита чата
+            return await self._request("sendMediaGroup", chat_id, priority, cost=len(media), data=data, files=files)
+        except Exception as e:
+            print(f"Telegram sendMediaGroup error: {e}")
+            return None
+    
+    def _attachment_keys(self, att: dict, keys: tuple) -> list:
+        return [*keys, FileIdCache.content_key(att["handle"].sha256)]
+    
+    async def send_attachment(
+        self,
+        chat_id: str | int,
+        att: dict,
+        caption: str = None,
+        priority: int = INTERACTIVE,
+        keys: tuple = ()
+    ) -> dict:
+        """Отправляет вложение {filename, handle, size}; уже загруженный файл уходит по file_id"""
+        keys = self._attachment_keys(att, keys)
+        cached = self.file_ids.get(*keys)
+        if cached:
+            result = await self.send_document(chat_id, cached["file_id"], att["filename"], caption, priority)
+            if result and result.get("ok"):
+                return result
+            self.file_ids.discard(*keys)
+        
+        result = await self.send_document(chat_id, att["handle"].open(), att["filename"], caption, priority)
+        file_id = document_file_id((result or {}).get("result"))
+        if file_id:
+            self.file_ids.set(file_id, att["filename"], *keys)
+        return result
+    
+    async def send_attachments(self, chat_id: str | int, attachments: list, priority: int = INTERACTIVE):
+        """Вложения альбомами по 10; группы загружаются параллельно, не больше upload_concurrency сразу"""
+        semaphore = asyncio.Semaphore(self.upload_concurrency)
+        
+        async def send_group(group: list):
+            async with semaphore:
+                if len(group) > 1:
+                    documents = []
+                    for att in group:
+                        cached = self.file_ids.get(*self._attachment_keys(att, ()))
+                        file_data = cached["file_id"] if cached else att["handle"].open()
+                        documents.append((att["filename"], file_data, f"📎 {att['filename']}"))
+                    
+                    result = await self.send_media_group(chat_id, documents, priority=priority)
+                    if result and result.get("ok"):
+                        for att, message in zip(group, result.get("result", [])):
+                            file_id = document_file_id(message)
+                            if file_id:
+                                self.file_ids.set(file_id, att["filename"], *self._attachment_keys(att, ()))
+                        return
+                    print(f"sendMediaGroup не прошёл, вложения уйдут по одному: {result}")
+                
+                for att in group:
+                    await self.send_attachment(chat_id, att, f"📎 {att['filename']}", priority=priority)
+        
+        groups = attachment_groups(attachments, self.group_max_bytes)
+        await asyncio.gather(*(send_group(group) for group in groups))
+    
     async def send_email_with_attachments(
         self, 
         chat_id: str | int, 
         email_data: dict,
-        formatted_text: str
-    ):
-        await self.send_message(chat_id, formatted_text)
+        formatted_text: str,
+        reply_markup: dict = None,
+        priority: int = INTERACTIVE
+    ) -> dict:
+        """Отправляет письмо и его скачанные вложения; возвращает ответ на сообщение с письмом"""
+        result = await self.send_message(chat_id, formatted_text, reply_markup=reply_markup, priority=priority)
         
-        for att in email_data.get("attachments", []):
-            caption = f"📎 {att['filename']}"
-            await self.send_document(chat_id, att["data"], att["filename"], caption)
+        # Вложения без handle не скачаны — они отправляются по кнопке
+        attachments = [att for att in email_data.get("attachments", []) if att.get("handle") is not None]
+        if attachments:
+            await self.send_attachments(chat_id, attachments, priority=priority)
+        return result
     
     def get_allowed_chats(self) -> list:
         chat_ids = os.getenv("TELEGRAM_CHAT_ID", "")
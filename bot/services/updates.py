@@ -0,0 +1,141 @@
+import asyncio
+import os
+from collections import deque
+from typing import Awaitable, Callable
+
+
+class UpdateDedup:
+    """Окно последних UPDATE_DEDUP_SIZE обработанных update_id в памяти процесса.
+
+    Telegram повторяет апдейт, если webhook ответил поздно или с ошибкой;
+    повтор отбрасывается одной проверкой по множеству, без IMAP и Bot API.
+    Окно не переживает перезапуск и не общее для инстансов serverless —
+    повтор, попавший в другой инстанс, будет обработан.
+    """
+
+    def __init__(self, size: int = None):
+        self.size = size or int(os.getenv("UPDATE_DEDUP_SIZE", 1000))
+        self._recent = deque()
+        self._seen = set()
+        self.duplicates = 0
+
+    def add(self, update_id: int) -> bool:
+        """Отмечает апдейт обработанным; False — он уже был"""
+        if update_id in self._seen:
+            self.duplicates += 1
+            return False
+
+        self._recent.append(update_id)
+        self._seen.add(update_id)
+        if len(self._recent) > self.size:
+            self._seen.discard(self._recent.popleft())
+        return True
+
+    def discard(self, update_id: int):
+        """Апдейт не обработан (ошибка) — повтор от Telegram должен пройти"""
+        if update_id in self._seen:
+            self._seen.discard(update_id)
+            self._recent.remove(update_id)
+
+
+class UpdateQueue:
+    """Очередь апдейтов для быстрого ответа на webhook.
+
+    Апдейт кладётся в очередь своего чата, webhook сразу отвечает 200.
+    Пул из WEBHOOK_WORKERS задач обрабатывает апдейты: один чат — строго по
+    очереди, разные чаты — параллельно. Не больше WEBHOOK_QUEUE_SIZE ожидающих.
+    """
+
+    def __init__(self, handler: Callable[[dict], Awaitable], workers: int = None, max_pending: int = None):
+        self.handler = handler
+        self.workers = workers or int(os.getenv("WEBHOOK_WORKERS", 8))
+        self.max_pending = max_pending or int(os.getenv("WEBHOOK_QUEUE_SIZE", 1000))
+
+        # Чат есть в _chats, пока у него есть апдейты или один из них обрабатывается
+        self._chats: dict[str, deque] = {}
+        self._ready: asyncio.Queue | None = None
+        self._idle: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        self.pending = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._max_depth = 0
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        self._loop = loop
+        self._chats = {}
+        self.pending = 0
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, chat_id: str, update: dict) -> bool:
+        """Ставит апдейт в очередь; False — очередь переполнена, обработайте сами"""
+        self._ensure_workers()
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return False
+
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            queue = self._chats[chat_id] = deque()
+            self._ready.put_nowait(chat_id)
+        queue.append(update)
+
+        self.pending += 1
+        self._max_depth = max(self._max_depth, self.pending)
+        self._idle.clear()
+        return True
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._chats[chat_id]
+            update = queue.popleft()
+            try:
+                await self.handler(update)
+                self.processed += 1
+            except Exception as e:
+                print(f"Ошибка обработки апдейта {update.get('update_id')}: {e}")
+                self.failed += 1
+            finally:
+                self.pending -= 1
+
+            # Остальные апдейты чата — в конец очереди, чтобы не задерживать другие чаты
+            if queue:
+                self._ready.put_nowait(chat_id)
+            else:
+                del self._chats[chat_id]
+                if not self._chats:
+                    self._idle.set()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "chats": len(self._chats),
+            "max_pending": self._max_depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    async def close(self, timeout: float = 10):
+        """Дожидается обработки очереди (не дольше timeout) и останавливает воркеров"""
+        if not self._tasks or self._loop is not asyncio.get_running_loop():
+            self._tasks = []
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Не обработано апдейтов: {self.pending}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
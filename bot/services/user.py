@@ -1,16 +1,104 @@
 import os
+import threading
+import time
 from datetime import datetime
 from typing import Optional
 
-from database.supabase import SupabaseSession
+from database.database import UserStore, get_user_store
+
+
+class UserCache:
+    """Записи пользователей в памяти процесса, чтобы не ходить в базу на каждое нажатие.
+
+    Зарегистрированные живут USER_CACHE_TTL секунд. Отсутствующие и ещё не
+    зарегистрированные — USER_CACHE_NEGATIVE_TTL: их статус может поменять
+    другой экземпляр бота.
+    """
+
+    def __init__(self, ttl: float = None, negative_ttl: float = None, max_entries: int = None):
+        self.ttl = ttl or float(os.getenv("USER_CACHE_TTL", 300))
+        self.negative_ttl = negative_ttl or float(os.getenv("USER_CACHE_NEGATIVE_TTL", 30))
+        self.max_entries = max_entries or int(os.getenv("USER_CACHE_SIZE", 10000))
+        self._lock = threading.Lock()
+        self._entries: dict[int, tuple[float, Optional[dict]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, user_id: int) -> tuple[bool, Optional[dict]]:
+        """(найдено в кэше, запись); запись None — пользователя нет в базе"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def store(self, user_id: int, user: Optional[dict]):
+        ttl = self.ttl if user and user.get("is_registered") else self.negative_ttl
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                self._entries = {key: entry for key, entry in self._entries.items() if entry[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[user_id] = (time.monotonic() + ttl, user)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
 
 
 class UserService:
     ACCESS_PASSWORD = os.getenv("BOT_PASSWORD", "secret123")
+    _cache: UserCache = None
+    _store: type[UserStore] = None
+    
+    @classmethod
+    def cache(cls) -> UserCache:
+        """Кэш создаётся при первом обращении, когда .env уже загружен; общий для подклассов"""
+        if UserService._cache is None:
+            UserService._cache = UserCache()
+        return UserService._cache
+    
+    @classmethod
+    def store(cls) -> type[UserStore]:
+        """Хранилище из USER_STORE; выбирается при первом обращении, когда .env уже загружен"""
+        if cls._store is None:
+            cls._store = get_user_store()
+        return cls._store
     
     @classmethod
     def get_user(cls, user_id: int) -> Optional[dict]:
-        return SupabaseSession.get_user(int(user_id))
+        found, user = cls.cache().lookup(int(user_id))
+        if found:
+            return user
+        return cls._load_user(user_id)
+    
+    @classmethod
+    def _load_user(cls, user_id: int) -> Optional[dict]:
+        """Запись из базы мимо кэша (промах уже учтён), затем в кэш"""
+        user = cls.store().get_user(int(user_id))
+        cls.cache().store(int(user_id), user)
+        return user
+    
+    @classmethod
+    def _stored(cls, user_id: int, user: Optional[dict]) -> Optional[dict]:
+        """После записи в базу кэш обновляется тем, что вернула база"""
+        if user:
+            cls.cache().store(int(user_id), user)
+        else:
+            cls.cache().invalidate(int(user_id))
+        return user
     
     @classmethod
     def is_registered(cls, user_id: int) -> bool:
@@ -29,24 +117,15 @@ class UserService:
         firstname: str = None,
         username: str = None
     ) -> dict:
-        user = cls.get_user(user_id)
-        
-        if user:
-            return SupabaseSession.update_user(int(user_id), {
-                "is_registered": True,
-                "name": name,
-                "firstname": firstname,
-                "username": username
-            })
-        else:
-            return SupabaseSession.create_user({
-                "user_id": int(user_id),
-                "name": name,
-                "firstname": firstname,
-                "username": username,
-                "is_registered": True,
-                "created_at": datetime.utcnow().isoformat()
-            })
+        # Один запрос вместо чтения и записи: гонки между проверкой и вставкой нет
+        return cls._stored(user_id, cls.store().upsert_user({
+            "user_id": int(user_id),
+            "name": name,
+            "firstname": firstname,
+            "username": username,
+            "is_registered": True,
+            "created_at": datetime.utcnow().isoformat()
+        }))
     
     @classmethod
     def create_unregistered_user(
@@ -60,16 +139,20 @@ class UserService:
         
         if user:
             return user
-        
-        return SupabaseSession.create_user({
+        return cls._create_unregistered(user_id, name, firstname, username)
+    
+    @classmethod
+    def _create_unregistered(cls, user_id: int, name: str, firstname: str = None, username: str = None) -> dict:
+        # Строку мог успеть создать параллельный апдейт — тогда она остаётся как есть
+        return cls._stored(user_id, cls.store().upsert_user({
             "user_id": int(user_id),
             "name": name,
             "firstname": firstname,
             "username": username,
             "is_registered": False,
             "created_at": datetime.utcnow().isoformat()
-        })
+        }, overwrite=False))
     
     @classmethod
     def get_all_users(cls) -> list[dict]:
-        return SupabaseSession.get_registered_users()
+        return cls.store().get_registered_users()
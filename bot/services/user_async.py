@@ -0,0 +1,76 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+from .user import UserService
+
+
+class AsyncUserService(UserService):
+    """UserService для async-обработчиков: те же методы, но не блокируют event loop.
+
+    Клиенты Supabase и SQLite синхронные, поэтому запрос к хранилищу уходит в
+    пул из USER_STORE_WORKERS потоков. Попадание в кэш отвечает сразу, без потока.
+    """
+
+    _executor: ThreadPoolExecutor | None = None
+
+    @classmethod
+    def executor(cls) -> ThreadPoolExecutor:
+        if AsyncUserService._executor is None:
+            AsyncUserService._executor = ThreadPoolExecutor(
+                int(os.getenv("USER_STORE_WORKERS", 8)), thread_name_prefix="user-store"
+            )
+        return AsyncUserService._executor
+
+    @classmethod
+    async def _run(cls, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls.executor(), partial(func, *args, **kwargs))
+
+    @classmethod
+    async def get_user(cls, user_id: int) -> Optional[dict]:
+        found, user = UserService.cache().lookup(int(user_id))
+        if found:
+            return user
+        return await cls._run(UserService._load_user, user_id)
+
+    @classmethod
+    async def is_registered(cls, user_id: int) -> bool:
+        user = await cls.get_user(user_id)
+        return user is not None and user.get("is_registered", False)
+
+    @classmethod
+    async def register_user(
+        cls,
+        user_id: int,
+        name: str,
+        firstname: str = None,
+        username: str = None
+    ) -> dict:
+        return await cls._run(UserService.register_user, user_id, name, firstname, username)
+
+    @classmethod
+    async def create_unregistered_user(
+        cls,
+        user_id: int,
+        name: str,
+        firstname: str = None,
+        username: str = None
+    ) -> dict:
+        user = await cls.get_user(user_id)
+        if user:
+            return user
+        return await cls._run(UserService._create_unregistered, user_id, name, firstname, username)
+
+    @classmethod
+    async def get_all_users(cls) -> list[dict]:
+        return await cls._run(UserService.get_all_users)
+
+    @classmethod
+    def close(cls):
+        """Останавливает пул потоков; вызывается при остановке приложения"""
+        if AsyncUserService._executor is not None:
+            AsyncUserService._executor.shutdown(wait=False)
+            AsyncUserService._executor = None
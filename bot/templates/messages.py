@@ -4,8 +4,11 @@ def escape_html(text: str) -> str:
 
 def format_email_full(email_data: dict) -> str:
     body = email_data["body"]
+    # truncated — в превью скачано только начало текста
     if len(body) > 2500:
         body = body[:2500] + "\n\n... (обрезано)"
+    elif email_data.get("truncated"):
+        body += "\n\n... (обрезано)"
     
     body = escape_html(body)
     subject = escape_html(email_data['subject'])
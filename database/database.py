@@ -0,0 +1,55 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class UserStore(ABC):
+    """Хранилище пользователей бота; реализации — классы с classmethod-ами"""
+
+    @classmethod
+    @abstractmethod
+    def get_user(cls, user_id: int) -> Optional[dict]:
+        pass
+
+    @classmethod
+    @abstractmethod
+    def create_user(cls, user_data: dict) -> dict:
+        pass
+
+    @classmethod
+    @abstractmethod
+    def update_user(cls, user_id: int, data: dict) -> dict:
+        pass
+
+    @classmethod
+    @abstractmethod
+    def upsert_user(cls, user_data: dict, overwrite: bool = True) -> dict:
+        """Вставка или обновление по user_id одним запросом, возвращает итоговую строку.
+
+        overwrite=False — существующая строка не меняется. created_at при обновлении не трогается.
+        """
+        pass
+
+    @classmethod
+    @abstractmethod
+    def get_registered_users(cls) -> list[dict]:
+        pass
+
+    @classmethod
+    @abstractmethod
+    def delete_user(cls, user_id: int) -> bool:
+        pass
+
+
+def get_user_store(name: str = None) -> type[UserStore]:
+    """USER_STORE=supabase|sqlite; модуль хранилища импортируется только выбранный"""
+    name = (name or os.getenv("USER_STORE", "supabase")).lower()
+
+    if name == "supabase":
+        from .supabase import SupabaseSession
+        return SupabaseSession
+    elif name == "sqlite":
+        from .sessions import SQLiteSession
+        return SQLiteSession
+    else:
+        raise ValueError(f"Неизвестное хранилище пользователей: {name}")
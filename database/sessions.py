@@ -1,10 +1,17 @@
-from sqlmodel import Session, SQLModel, create_engine
-from typing import Generator
+import os
+from datetime import timezone
+from sqlalchemy import bindparam, event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, SQLModel, create_engine, select
+from typing import Generator, Optional
 from contextlib import contextmanager
 
+from .database import UserStore
+from .models import User
+
 
 class MySession:
-    database: str = "database.db"
+    database: str = os.getenv("SQLITE_DATABASE", "database.db")
     driver: str = "sqlite"
     engine = None
     
@@ -14,8 +21,13 @@ class MySession:
             cls.engine = create_engine(
                 f"{cls.driver}:///{cls.database}",
                 echo=False,  
-                connect_args={"check_same_thread": False}  # For SQLite
+                connect_args={"check_same_thread": False},  # For SQLite
+                # Соединения переиспользуются между запросами, а не открываются на каждый
+                pool_size=int(os.getenv("SQLITE_POOL_SIZE", 5)),
+                max_overflow=int(os.getenv("SQLITE_MAX_OVERFLOW", 10)),
             )
+            if cls.driver == "sqlite":
+                event.listen(cls.engine, "connect", _sqlite_pragmas)
         return cls.engine
     
     @classmethod
@@ -60,4 +72,104 @@ class MySession:
             return list(session.exec(query).all())
 
 
-MySession._init_engine()
\ No newline at end of file
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL: чтения не ждут записи; NORMAL в WAL не теряет данные при падении процесса
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+MySession._init_engine()
+
+
+# Запросы собираются один раз: SQLAlchemy кэширует их компиляцию, sqlite3 — подготовленные выражения
+_USER_BY_ID = select(User).where(User.user_id == bindparam("user_id"))
+_REGISTERED_USERS = select(User).where(User.is_registered == True)  # noqa: E712
+
+
+class SQLiteSession(UserStore):
+    """Пользователи в локальной SQLite через MySession — без сетевого запроса на каждый апдейт"""
+    _ready = False
+    
+    @classmethod
+    def _session(cls):
+        if not cls._ready:
+            MySession.create_db()
+            cls._ready = True
+        return MySession.get_session()
+    
+    @staticmethod
+    def _to_dict(user: Optional[User]) -> Optional[dict]:
+        # Как у Supabase: даты строками ISO
+        return user.model_dump(mode="json") if user else None
+    
+    @classmethod
+    def get_user(cls, user_id: int) -> Optional[dict]:
+        with cls._session() as session:
+            return cls._to_dict(session.exec(_USER_BY_ID, params={"user_id": user_id}).first())
+    
+    @staticmethod
+    def _validated(user_data: dict) -> User:
+        user = User.model_validate(user_data)
+        # UserService передаёт utcnow() без зоны, а SQLModel принимает только даты с зоной
+        if user.created_at.tzinfo is None:
+            user.created_at = user.created_at.replace(tzinfo=timezone.utc)
+        return user
+    
+    @classmethod
+    def create_user(cls, user_data: dict) -> dict:
+        user = cls._validated(user_data)
+        with cls._session() as session:
+            session.add(user)
+            session.flush()
+            return cls._to_dict(user)
+    
+    @classmethod
+    def update_user(cls, user_id: int, data: dict) -> dict:
+        with cls._session() as session:
+            user = session.exec(_USER_BY_ID, params={"user_id": user_id}).first()
+            if user is None:
+                return None
+            for name, value in data.items():
+                setattr(user, name, value)
+            session.add(user)
+            session.flush()
+            return cls._to_dict(user)
+    
+    @classmethod
+    def upsert_user(cls, user_data: dict, overwrite: bool = True) -> dict:
+        """INSERT ... ON CONFLICT DO UPDATE ... RETURNING — одна команда, без чтения перед записью"""
+        values = cls._validated(user_data).model_dump()
+        statement = sqlite_insert(User).values(**values)
+        if overwrite:
+            # Обновляются только переданные колонки, дата создания остаётся прежней
+            statement = statement.on_conflict_do_update(
+                index_elements=[User.user_id],
+                set_={name: statement.excluded[name] for name in user_data if name not in ("user_id", "created_at")},
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=[User.user_id])
+        statement = statement.returning(*User.__table__.columns)
+        
+        with cls._session() as session:
+            row = session.exec(statement).mappings().first()
+            if row is not None:
+                return cls._to_dict(User.model_validate(dict(row)))
+            # DO NOTHING не возвращает существующую строку
+            return cls._to_dict(session.exec(_USER_BY_ID, params={"user_id": values["user_id"]}).first())
+    
+    @classmethod
+    def get_registered_users(cls) -> list[dict]:
+        with cls._session() as session:
+            return [cls._to_dict(user) for user in session.exec(_REGISTERED_USERS).all()]
+    
+    @classmethod
+    def delete_user(cls, user_id: int) -> bool:
+        with cls._session() as session:
+            user = session.exec(_USER_BY_ID, params={"user_id": user_id}).first()
+            if user is None:
+                return False
+            session.delete(user)
+            return True
@@ -1,14 +1,21 @@
 import os
-from supabase import create_client, Client
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+from .database import UserStore
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 
 class SupabaseClient:
-    _client: Client = None
+    _client: "Client" = None
     
     @classmethod
-    def get_client(cls) -> Client:
+    def get_client(cls) -> "Client":
         if cls._client is None:
+            # supabase тянет httpx, postgrest, realtime и т.д. — импорт при первом запросе к базе
+            from supabase import create_client
+            
             url = os.getenv("SUPABASE_URL")
             key = os.getenv("SUPABASE_KEY")
             
@@ -24,7 +31,7 @@ class SupabaseClient:
         return cls.get_client().table(name)
 
 
-class SupabaseSession:
+class SupabaseSession(UserStore):
     @classmethod
     def get_user(cls, user_id: int) -> Optional[dict]:
         response = SupabaseClient.table("users").select("*").eq("user_id", user_id).execute()
@@ -40,6 +47,20 @@ class SupabaseSession:
         response = SupabaseClient.table("users").update(data).eq("user_id", user_id).execute()
         return response.data[0] if response.data else None
     
+    @classmethod
+    def upsert_user(cls, user_data: dict, overwrite: bool = True) -> dict:
+        if overwrite:
+            # Обновляются все переданные колонки — created_at при вставке заполнит DEFAULT NOW()
+            user_data = {key: value for key, value in user_data.items() if key != "created_at"}
+        
+        response = SupabaseClient.table("users").upsert(
+            user_data, on_conflict="user_id", ignore_duplicates=not overwrite
+        ).execute()
+        if response.data:
+            return response.data[0]
+        # ignore_duplicates не возвращает уже существующую строку
+        return cls.get_user(user_data["user_id"])
+    
     @classmethod
     def get_registered_users(cls) -> list[dict]:
         response = SupabaseClient.table("users").select("*").eq("is_registered", True).execute()
@@ -1,22 +1,28 @@
 import os
+import sys
 import asyncio
 from collections import deque
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from dotenv import load_dotenv
-import uvicorn
 
-from bot.services import TelegramService, MailService
-from bot.handlers import handle_command, handle_callback, handle_text_message
-from bot.keyboards import get_next_button
+from bot.services import TelegramService, AsyncMailService, AsyncUserService, UserService
+from bot.services.attachments import close_attachments
+from bot.services.scheduler import BULK
+from bot.services.updates import UpdateDedup, UpdateQueue
+from bot.handlers import handle_update, update_chat_id
+from bot.keyboards import get_next_button, get_attachment_buttons
 from bot.templates.messages import format_email_full
 
 load_dotenv()
 
 tg: TelegramService = None
-mail: MailService = None
+mail: AsyncMailService = None
 email_queues: dict = {}
+new_mail_event: asyncio.Event = None
+updates: UpdateQueue = None
+seen_updates = UpdateDedup()
 
 
 async def notify_new_emails(chat_id: str, emails: list):
@@ -34,48 +40,148 @@ async def notify_new_emails(chat_id: str, emails: list):
     if count == 1:
         em = queue.popleft()
         formatted = format_email_full(em)
-        await tg.send_email_with_attachments(chat_id, em, formatted)
+        await tg.send_email_with_attachments(
+            chat_id, em, formatted, reply_markup=get_attachment_buttons(em), priority=BULK
+        )
+        close_attachments(em)
     elif count > 1:
         em = queue.popleft()
         remaining = len(queue)
         formatted = format_email_full(em)
+        close_attachments(em)
         await tg.send_message(
             chat_id,
             formatted,
-            reply_markup=get_next_button(remaining)
+            reply_markup=get_next_button(remaining, em),
+            priority=BULK
         )
 
 
+async def wait_for_new_mail(interval: int):
+    """Ждёт сигнала IDLE, но не дольше интервала опроса"""
+    try:
+        await asyncio.wait_for(new_mail_event.wait(), timeout=interval)
+    except asyncio.TimeoutError:
+        pass
+    new_mail_event.clear()
+
+
 async def mail_polling_loop():
-    global mail, tg
+    global mail, tg, new_mail_event
     
     chat_id = os.getenv("TELEGRAM_CHAT_ID")
     interval = int(os.getenv("POLL_INTERVAL", 30))
     
-    print(f"📧 Проверка почты каждые {interval} сек")
+    new_mail_event = asyncio.Event()
+    mail.start_idle(new_mail_event.set)
+    
+    print(f"📧 Проверка почты каждые {interval} сек (и по IDLE)")
     
     while True:
         try:
-            new_emails = mail.check_new_emails()
+            new_emails = await mail.check_new_emails(preview=True)
             if new_emails:
                 print(f"📬 Новых писем: {len(new_emails)}")
                 await notify_new_emails(chat_id, new_emails)
         except Exception as e:
             print(f"Ошибка: {e}")
         
-        await asyncio.sleep(interval)
+        await wait_for_new_mail(interval)
+
+
+async def process_updates(batch: list):
+    """Пачка апдейтов: чаты параллельно, апдейты одного чата по порядку"""
+    chats: dict[str, list] = {}
+    for update in batch:
+        chat_id = update_chat_id(update)
+        if chat_id is not None and seen_updates.add(update["update_id"]):
+            chats.setdefault(chat_id, []).append(update)
+    
+    async def process_chat(updates: list):
+        for update in updates:
+            try:
+                await handle_update(update, tg, mail, email_queues)
+            except Exception as e:
+                print(f"Ошибка обработки апдейта {update['update_id']}: {e}")
+    
+    await asyncio.gather(*(process_chat(updates) for updates in chats.values()))
+
+
+async def updates_polling_loop():
+    """getUpdates вместо webhook: offset сдвигается после обработки всей пачки"""
+    timeout = int(os.getenv("POLLING_TIMEOUT", 50))
+    offset = None
+    errors = 0
+    
+    print(f"📨 Long polling getUpdates (timeout {timeout} сек)")
+    
+    try:
+        while True:
+            try:
+                batch = await tg.get_updates(offset, timeout)
+                errors = 0
+            except Exception as e:
+                # Сеть или 409 (установлен webhook) — повтор с нарастающей паузой
+                errors += 1
+                delay = min(2 ** errors, 60)
+                print(f"Ошибка getUpdates: {e}, повтор через {delay} сек")
+                await asyncio.sleep(delay)
+                continue
+            
+            if batch:
+                await process_updates(batch)
+                offset = batch[-1]["update_id"] + 1
+    finally:
+        # Подтверждаем обработанную пачку, чтобы после перезапуска она не пришла снова
+        if offset is not None:
+            try:
+                await tg.get_updates(offset, 0, limit=1)
+            except Exception as e:
+                print(f"Не удалось подтвердить апдейты: {e}")
+
+
+async def run_polling():
+    global tg, mail
+    
+    tg_token = os.getenv("TELEGRAM_BOT_TOKEN")
+    chat_id = os.getenv("TELEGRAM_CHAT_ID")
+    
+    if not tg_token or not chat_id:
+        print("❌ Не заданы TELEGRAM_BOT_TOKEN и TELEGRAM_CHAT_ID")
+        return
+    
+    tg = TelegramService(tg_token)
+    mail = AsyncMailService()
+    mail_task = asyncio.create_task(mail_polling_loop())
+    
+    print(f"🚀 Бот запущен без webhook")
+    print(f"📧 Почта: {os.getenv('YANDEX_EMAIL')}")
+    print(f"💬 Telegram chat: {chat_id}")
+    print("-" * 40)
+    
+    try:
+        await updates_polling_loop()
+    finally:
+        mail_task.cancel()
+        await mail.close()
+        await tg.close()
+        AsyncUserService.close()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global tg, mail
+    global tg, mail, updates
     
     tg_token = os.getenv("TELEGRAM_BOT_TOKEN")
     chat_id = os.getenv("TELEGRAM_CHAT_ID")
     
     if tg_token and chat_id:
         tg = TelegramService(tg_token)
-        mail = MailService()
+        mail = AsyncMailService()
+        
+        # WEBHOOK_MODE=queue: webhook отвечает сразу, апдейт обрабатывается в фоне
+        if os.getenv("WEBHOOK_MODE", "sync") == "queue":
+            updates = UpdateQueue(lambda update: handle_update(update, tg, mail, email_queues))
         
         asyncio.create_task(mail_polling_loop())
         
@@ -85,6 +191,14 @@ async def lifespan(app: FastAPI):
         print("-" * 40)
     
     yield
+    
+    if updates:
+        await updates.close()
+    if mail:
+        await mail.close()
+    if tg:
+        await tg.close()
+    AsyncUserService.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -96,39 +210,31 @@ async def webhook(request: Request):
     
     data = await request.json()
     
-    if "callback_query" in data:
-        callback = data["callback_query"]
-        callback_id = callback["id"]
-        chat_id = str(callback["message"]["chat"]["id"])
-        callback_data = callback["data"]
-        
-        return await handle_callback(
-            callback_data, callback_id, chat_id, 
-            tg, mail, email_queues
-        )
-    
-    if "message" in data:
-        message = data["message"]
-        chat_id = str(message["chat"]["id"])
-        text = message.get("text", "")
-        
-        user = message.get("from", {})
-        user_data = {
-            "firstname": user.get("first_name", ""),
-            "name": f"{user.get('first_name', '')} {user.get('last_name', '')}".strip(),
-            "username": user.get("username", ""),
-        }
-        
-        if text.startswith("/"):
-            return await handle_command(text, chat_id, tg, mail, email_queues, user_data)
-        
-        return await handle_text_message(text, chat_id, tg, user_data)
+    chat_id = update_chat_id(data)
+    if chat_id is None or not seen_updates.add(data["update_id"]):
+        return "OK"
+    if updates and updates.submit(chat_id, data):
+        return "OK"
     
-    return "OK"
+    try:
+        return await handle_update(data, tg, mail, email_queues)
+    except Exception:
+        seen_updates.discard(data["update_id"])
+        raise
 
 
 @app.get("/health")
 async def health():
+    if tg:
+        result = {
+            "status": "ok",
+            "telegram_queue": tg.scheduler.stats(),
+            "duplicate_updates": seen_updates.duplicates,
+            "user_cache": UserService.cache().stats(),
+        }
+        if updates:
+            result["updates"] = updates.stats()
+        return result
     return {"status": "ok"}
 
 
@@ -141,8 +247,22 @@ def main():
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", 5000))
     
+    # Нужен только локальному серверу, не polling-режиму и не импорту app
+    import uvicorn
+    
     uvicorn.run(app, host=host, port=port)
 
 
+def polling():
+    """Без публичного адреса: апдейты через getUpdates, HTTP-сервер не нужен"""
+    try:
+        asyncio.run(run_polling())
+    except KeyboardInterrupt:
+        pass
+
+
 if __name__ == "__main__":
-    main()
+    if "--polling" in sys.argv:
+        polling()
+    else:
+        main()